@@ -8,29 +8,25 @@ import json
 import logging
 import datetime
 import asyncio
+import os
+from contextlib import aclosing
 from typing import Dict, Any, Optional, AsyncGenerator, Type
 from pydantic import BaseModel, Field
 from agentscope.agent import ReActAgent as ASReActAgent
 from agentscope.message import Msg
-from agentscope.token import TokenCounterBase
 from core.skill_manager import SkillManager
-from core.prompts import REACT_AGENT_SYSTEM_PROMPT
+from core.prompts import REACT_AGENT_SYSTEM_PROMPT, REACT_AGENT_CONTEXT_PROMPT
+from core.run_events import emit_event, get_run_channel
+from core.context_window import ContextWindow
+from core.memory_compressor import MemoryCompressor
+from core.artifact_store import artifact_store, new_run_id, READ_TOOL_NAME
+from core.tool_cache import tool_cache, WRITE_TOOLS
+from core.token_counter import token_counter
+from core.metrics import REACT_RUNS, REACT_ITERATIONS, REACT_TOOL_CALLS, ModelCallTimer
+from core.tracing import tracer, payload_size
 
 logger = logging.getLogger("LocalManus-ReActAgent")
 
-# Global callback for streaming thinking content
-_thinking_callback = None
-
-
-def set_thinking_callback(callback):
-    """Set a callback function to receive thinking content stream.
-
-    Args:
-        callback: A function that receives thinking content chunks
-    """
-    global _thinking_callback
-    _thinking_callback = callback
-
 
 # ============================================================================
 # Memory Compression Schema
@@ -82,61 +78,55 @@ class CompressionSummarySchema(BaseModel):
 
 
 # ============================================================================
-# Simple Token Counter
+# Streaming Deltas
 # ============================================================================
 
-class SimpleTokenCounter(TokenCounterBase):
-    """Simple token counter using character-based estimation.
+def _block_field(block, field: str):
+    if isinstance(block, dict):
+        return block.get(field)
+    return getattr(block, field, None)
 
-    Uses a rough estimate of ~4 characters per token for most languages.
-    For more accurate counting, consider using tiktoken for OpenAI models.
-    """
-
-    def __init__(self, chars_per_token: int = 4):
-        self.chars_per_token = chars_per_token
 
-    async def count(self, messages) -> int:
-        """Count tokens in messages.
+class StreamDeltas:
+    """Turns cumulative streaming content into per-block deltas.
 
-        Args:
-            messages: Either a string or list of Msg objects
-
-        Returns:
-            Estimated token count
-        """
-        if isinstance(messages, str):
-            return len(messages) // self.chars_per_token
-
-        total_chars = 0
-        if isinstance(messages, list):
-            for msg in messages:
-                if isinstance(msg, Msg):
-                    content = msg.get_text_content() if hasattr(
-                        msg, 'get_text_content') else str(msg.content)
-                    total_chars += len(content)
-                elif isinstance(msg, dict):
-                    content = msg.get('content', '')
-                    if isinstance(content, str):
-                        total_chars += len(content)
-                    elif isinstance(content, list):
-                        for block in content:
-                            if isinstance(block, dict):
-                                total_chars += len(block.get('text', ''))
-                            elif hasattr(block, 'text'):
-                                total_chars += len(block.text)
-                else:
-                    total_chars += len(str(msg))
-        else:
-            total_chars = len(str(messages))
+    Streaming chunks repeat everything generated so far. Tracking how much of
+    each block was already sent lets every chunk forward only the new suffix,
+    so the work per chunk is proportional to the new text, not the total.
+    """
 
-        return total_chars // self.chars_per_token
+    def __init__(self):
+        self._offsets: Dict[tuple, int] = {}
+
+    def delta(self, key: tuple, text: str) -> str:
+        offset = self._offsets.get(key, 0)
+        if len(text) < offset:
+            # The block was restarted (e.g. a retried request); resend it
+            offset = 0
+        self._offsets[key] = len(text)
+        return text[offset:]
+
+    def blocks(self, content_blocks, block_type: str, field: str):
+        """Yield (key, delta) for each block of `block_type` with new text in `field`."""
+        if not isinstance(content_blocks, list):
+            return
+        position = 0
+        for block in content_blocks:
+            if _block_field(block, "type") != block_type:
+                continue
+            position += 1
+            text = _block_field(block, field) or ""
+            new_text = self.delta((block_type, position), text)
+            if new_text:
+                yield (block_type, position), new_text
 
 
 class ReActAgent(ASReActAgent):
     """Standardized ReAct Agent following AgentScope patterns.
 
     Features:
-    - Memory compression when token count exceeds threshold
+    - Memory compression: incremental background summaries (default) or
+      AgentScope's synchronous compression when the token threshold is crossed
     - SSE streaming support
     - Tool execution via skill manager
     """
@@ -181,7 +171,8 @@ class ReActAgent(ASReActAgent):
         compression_threshold: int = None,
         keep_recent: int = None,
         compression_model=None,
-        compression_formatter=None
+        compression_formatter=None,
+        compression_mode: str = None
     ):
         """Initialize the ReAct agent with AgentScope native implementation.
 
@@ -190,22 +181,35 @@ class ReActAgent(ASReActAgent):
             formatter: Message formatter for the model
             skill_manager: SkillManager instance for tool execution
             enable_compression: Whether to enable memory compression (default: True)
-            compression_threshold: Token threshold to trigger compression (default: 10000)
+            compression_threshold: Token threshold to trigger sync compression (default: 10000)
             keep_recent: Number of recent messages to keep uncompressed (default: 3)
             compression_model: Optional separate model for compression (default: use main model)
             compression_formatter: Optional formatter for compression model
+            compression_mode: "incremental" summarizes aged messages in the background,
+                "sync" uses AgentScope's blocking compression (default: MEMORY_COMPRESSION_MODE or incremental)
         """
+        compression_mode = compression_mode or os.getenv("MEMORY_COMPRESSION_MODE", "incremental")
+        keep = keep_recent or self.DEFAULT_KEEP_RECENT
+
         # Build compression config if enabled
         compression_config = None
-        if enable_compression:
+        compressor = None
+        if enable_compression and compression_mode == "incremental":
+            # Summaries are computed off the critical path and swapped in by the context window
+            compressor = MemoryCompressor(
+                model=compression_model or model,
+                formatter=compression_formatter or formatter,
+                summary_schema=CompressionSummarySchema,
+                compression_prompt=self.COMPRESSION_PROMPT,
+                summary_template=self.SUMMARY_TEMPLATE,
+                keep_recent=keep,
+            )
+            logger.info(f"Incremental memory compression enabled: keep_recent={keep}")
+        elif enable_compression:
             from agentscope.agent._react_agent import ReActAgent as OfficialReActAgent
 
-            # Create token counter
-            token_counter = SimpleTokenCounter(chars_per_token=4)
-
             # Use provided values or defaults
             threshold = compression_threshold or self.DEFAULT_COMPRESSION_THRESHOLD
-            keep = keep_recent or self.DEFAULT_KEEP_RECENT
 
             compression_config = OfficialReActAgent.CompressionConfig(
                 enable=True,
@@ -232,24 +236,43 @@ class ReActAgent(ASReActAgent):
         )
         self.skill_manager = skill_manager
         self.original_model = model  # Keep reference for streaming if needed
+        # System prompt of the turn being run (set by run_stream from its input)
+        self._turn_sys_prompt: Optional[str] = None
+        # Groups the artifacts of oversized tool results stored during one run
+        self._artifact_run_id = new_run_id()
+        # Keeps memory within the token budget (rolling summary + recent messages)
+        self.context_window = ContextWindow(compressor=compressor)
+        # Read-only tool calls of one reasoning step that may run at the same time
+        self.max_parallel_tools = int(os.getenv("TOOL_MAX_PARALLEL", "4"))
+        # Also send each thinking block's full text after its deltas
+        self.emit_thinking_final = os.getenv("THINKING_FINAL_EVENT", "false").lower() == "true"
+
+    # Static prompt shared by all agents, keyed by toolkit version: (version, prompt)
+    _static_prompt_cache: Optional[tuple] = None
+
+    def _build_static_prompt(self) -> str:
+        """Build the request-independent part of the system prompt, once per toolkit version."""
+        version = self.skill_manager.toolkit_version
+        cached = ReActAgent._static_prompt_cache
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        prompt = REACT_AGENT_SYSTEM_PROMPT.format(
+            skills_prompt=self.skill_manager.get_skills_prompt() or "",
+            tools_metadata=self.skill_manager.get_tools_metadata(),
+        )
+        ReActAgent._static_prompt_cache = (version, prompt)
+        return prompt
 
     def _build_system_prompt(self, user_context: Optional[Dict] = None) -> str:
-        """Build system prompt with current context and tools."""
+        """Build system prompt: cached static prefix (tools, skills) followed by per-request context."""
         current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         user_info_str = json.dumps(
             user_context, ensure_ascii=False) if user_context else "Anonymous"
-        skills_prompt = self.skill_manager.get_skills_prompt() or ""
-
-        # Get tools metadata from toolkit
-        tools_schemas = self.skill_manager.toolkit.get_json_schemas()
-        tools_metadata = json.dumps(
-            tools_schemas, indent=2, ensure_ascii=False)
 
-        return REACT_AGENT_SYSTEM_PROMPT.format(
+        return self._build_static_prompt() + REACT_AGENT_CONTEXT_PROMPT.format(
             current_time=current_time,
             user_info=user_info_str,
-            skills_prompt=skills_prompt,
-            tools_metadata=tools_metadata
         )
 
     async def run_stream(self, messages: list):
@@ -268,8 +291,12 @@ class ReActAgent(ASReActAgent):
         """
         MAX_ITERATIONS = 10
         iteration = 0
-        inner_iteration = 0
         new_messages = []
+        tool_call_count = 0
+        started_at = datetime.datetime.now()
+        cancelled = False
+        outcome = "completed"
+        error = None
 
         try:
             # Convert dict messages to Msg objects
@@ -284,6 +311,12 @@ class ReActAgent(ASReActAgent):
                 else:
                     msg_objects.append(m)
 
+            self._artifact_run_id = new_run_id()
+
+            # A leading system message carries this turn's system prompt
+            if msg_objects and msg_objects[0].role == "system":
+                self._turn_sys_prompt = msg_objects[0].get_text_content()
+
             # Get the last user message
             last_msg = msg_objects[-1] if msg_objects else None
             if not last_msg:
@@ -307,120 +340,190 @@ class ReActAgent(ASReActAgent):
                 # Check if we have tool calls
                 tool_calls = self._extract_tool_calls_from_msg(reasoning_msg)
 
-                # Extract and yield text content
+                # Text was streamed to the run channel while it was generated;
+                # without a channel (e.g. background jobs) yield it in one piece
                 text_content = self._extract_content(reasoning_msg)
-                if text_content:
+                if text_content and get_run_channel() is None:
                     yield {"content": text_content}
 
                 if len(tool_calls) == 0:
                     break
-                # === REACT LOOP ===
-                inner_iteration = 0
-                while inner_iteration < len(tool_calls):
-
-                    # === STEP 2: ACT (Tool Execution) ===
-                    if not tool_calls:
-                        # No more tool calls - task complete
-                        logger.info("No tool calls - task complete")
-                        break
-
-                    tc = tool_calls[inner_iteration]
-                    inner_iteration += 1
-                    # Execute each tool call
-                    tool_name = tc.get('function', {}).get(
-                        'name', tc.get('name', 'unknown'))
-                    tool_args = tc.get('function', {}).get('arguments', '{}')
-
-                    # Notify frontend about tool call
-                    yield {"content": f"\n\n🔧 **[Tool Call]** `{tool_name}`\n"}
-                    if tool_args and tool_args != '{}':
-                        try:
-                            args_display = json.loads(tool_args) if isinstance(
-                                tool_args, str) else tool_args
-                            yield {"content": f"```json\n{json.dumps(args_display, indent=2, ensure_ascii=False)}\n```\n"}
-                        except:
-                            pass
-
-                    # Execute tool
-                    yield {"content": "⏳ *Executing...*\n"}
-
-                    try:
-                        tool_result = await self._execute_tool(tc)
-
-                        # Yield tool result
-                        result_text = self._format_tool_result(tool_result)
-                        yield {"content": f"✅ **[Result]**\n{result_text}\n"}
-
-                        # Add tool result to memory for next iteration
-                        await self._add_tool_result_to_memory(tc, tool_result)
-                    except Exception as e:
-                        error_msg = f"❌ **[Error]**: {str(e)}\n"
-                        yield {"content": error_msg}
-                        await self._add_tool_result_to_memory(tc, f"Error: {str(e)}")
-
-                    # === STEP 3: OBSERVE (Continue Loop) ===
-                    # The tool results are now in memory, next iteration will use them
-                    yield {"content": "\n---\n"}
+                # === STEP 2: ACT (Tool Execution) ===
+                # Independent calls of one step run concurrently; results are
+                # streamed as they complete and fed back in call order
+                tool_call_count += len(tool_calls)
+                async with aclosing(self._run_tool_calls(tool_calls)) as tool_events:
+                    async for event in tool_events:
+                        yield event
+                # === STEP 3: OBSERVE (Continue Loop) ===
+                # The tool results are now in memory, next iteration will use them
 
                 # Store for sync
                 new_messages.append(
                     {"role": "assistant", "content": text_content or ""})
 
+        except (asyncio.CancelledError, GeneratorExit):
+            cancelled = True
+            outcome = "cancelled"
+            logger.info(f"ReAct loop cancelled after {iteration} iteration(s)")
+            raise
+
         except Exception as e:
+            outcome = "error"
+            error = str(e)
             logger.error(f"Error in ReAct loop: {str(e)}", exc_info=True)
             yield {"content": f"\n\n❌ **[Error]**: {str(e)}\n"}
 
         finally:
-            if new_messages:
+            self._turn_sys_prompt = None
+            REACT_RUNS.inc(outcome=outcome)
+            REACT_ITERATIONS.observe(iteration)
+            REACT_TOOL_CALLS.observe(tool_call_count)
+            tracer.annotate(iterations=iteration, tool_calls=tool_call_count, outcome=outcome)
+            meta = {
+                "iterations": iteration,
+                "tool_calls": tool_call_count,
+                "duration_s": (datetime.datetime.now() - started_at).total_seconds(),
+                "cancelled": cancelled,
+                "outcome": outcome,
+                "error": error,
+            }
+            # Without a channel (e.g. background jobs) the caller reads it from the stream
+            if get_run_channel() is None and not cancelled:
+                yield {"_meta": meta}
+            else:
+                await emit_event({"_meta": meta})
+            # Yielding here would swallow the cancellation
+            if new_messages and not cancelled:
                 yield {"_sync": new_messages}
 
+    async def _emit_text(self, content_blocks, deltas: StreamDeltas) -> None:
+        """Forward new answer text of a streaming chunk to the current run's event channel."""
+        if get_run_channel() is None:
+            return
+        if isinstance(content_blocks, str):
+            content_blocks = [{"type": "text", "text": content_blocks}]
+        for _, new_text in deltas.blocks(content_blocks, "text", "text"):
+            await emit_event({"content": new_text})
+
+    @staticmethod
+    def _thinking_texts(content_blocks) -> list:
+        """Text of each thinking block, in order."""
+        texts = []
+        if not isinstance(content_blocks, list):
+            return texts
+        for block in content_blocks:
+            if _block_field(block, 'type') == 'thinking':
+                # ThinkingBlock stores its text under 'thinking'
+                texts.append(_block_field(block, 'thinking') or _block_field(block, 'text') or '')
+        return texts
+
+    async def _emit_thinking(self, content_blocks, deltas: StreamDeltas) -> None:
+        """Forward new thinking text of a streaming chunk to the current run's event channel.
+
+        Only the part of each thinking block not sent before is emitted, so a
+        long reasoning trace is transmitted once instead of once per chunk.
+        """
+        if get_run_channel() is None:
+            return
+        for position, thinking_text in enumerate(self._thinking_texts(content_blocks), 1):
+            new_text = deltas.delta(('thinking', position), thinking_text)
+            if new_text:
+                await emit_event({"thinking": new_text})
+
+    async def _emit_thinking_final(self, content_blocks) -> None:
+        """Send the complete text of each thinking block once streaming has finished (THINKING_FINAL_EVENT)."""
+        if not self.emit_thinking_final or get_run_channel() is None:
+            return
+        for position, thinking_text in enumerate(self._thinking_texts(content_blocks), 1):
+            if thinking_text:
+                await emit_event({"thinking_final": {"block": position, "text": thinking_text}})
+
+    async def _format_prompt(self, sys_prompt: str) -> list:
+        """Format the system prompt and memory into the model API's message format."""
+        msgs = [Msg("system", sys_prompt, "system"), *await self.memory.get_memory()]
+        with tracer.span("format", messages=len(msgs)) as span:
+            prompt = await self.formatter.format(msgs=msgs)
+            span.set(prompt_chars=payload_size(prompt))
+        return prompt
+
     async def _stream_reasoning(self) -> Msg:
         """
         Stream reasoning from the model.
 
-        Returns the complete message after streaming.
+        Answer text and thinking are forwarded to the run's event channel as
+        they arrive. Returns the complete message after streaming.
         """
         from agentscope.agent._react_agent import _MemoryMark
 
-        # Handle plan notebook hints
-        if self.plan_notebook:
-            hint_msg = await self.plan_notebook.get_current_hint()
-            if hint_msg:
-                await self.memory.add(hint_msg, marks=_MemoryMark.HINT)
-
-        # Format prompt with system prompt and memory
-        prompt = await self.formatter.format(
-            msgs=[
-                Msg("system", self.sys_prompt, "system"),
-                *await self.memory.get_memory(),
-            ],
-        )
+        with tracer.span("reasoning", streaming=True) as span:
+            # Keep memory within the context budget (before hints are added, so
+            # trimming never touches marked messages)
+            sys_prompt = self._turn_sys_prompt or self.sys_prompt
+            await self.context_window.fit(self.memory, sys_prompt)
+
+            # Handle plan notebook hints
+            if self.plan_notebook:
+                hint_msg = await self.plan_notebook.get_current_hint()
+                if hint_msg:
+                    await self.memory.add(hint_msg, marks=_MemoryMark.HINT)
+
+            # Format prompt with system prompt and memory
+            prompt = await self._format_prompt(sys_prompt)
+
+            # Clear hint messages after use
+            await self.memory.delete_by_mark(mark=_MemoryMark.HINT)
+
+            # Call model with tools
+            with ModelCallTimer() as timer:
+                res = await self.model(
+                    prompt,
+                    tools=self.skill_manager.get_tool_schemas(),
+                    tool_choice=None,
+                )
 
-        # Clear hint messages after use
-        await self.memory.delete_by_mark(mark=_MemoryMark.HINT)
+            # Process streaming response
+            msg = Msg(name=self.name, content=[], role="assistant")
+            interrupted_by_user = False
+            deltas = StreamDeltas()
 
-        # Call model with tools
-        res = await self.model(
-            prompt,
-            tools=self.toolkit.get_json_schemas(),
-            tool_choice=None,
-        )
+            try:
+                if self.model.stream:
+                    # Chunks are cumulative: keep a reference to the latest one
+                    # and forward only what is new in each text block
+                    content_chunk = None
+                    # aclosing() releases the scheduler slot as soon as the
+                    # loop exits (e.g. on cancel), not when the stream is GC'd
+                    async with aclosing(res) as stream:
+                        async for content_chunk in stream:
+                            timer.chunk()
+                            msg.content = content_chunk.content
+                            await self._emit_thinking(content_chunk.content, deltas)
+                            await self._emit_text(content_chunk.content, deltas)
+                    timer.finish(content_chunk)
+                else:
+                    # Non-streaming: just use the result
+                    msg.content = list(res.content) if hasattr(res, 'content') else res
+                    await self._emit_thinking(msg.content, deltas)
+                    await self._emit_text(msg.content, deltas)
+                    timer.finish(res)
+                await self._emit_thinking_final(msg.content)
 
-        # Process streaming response
-        msg = Msg(name=self.name, content=[], role="assistant")
+            except asyncio.CancelledError:
+                interrupted_by_user = True
+                raise
 
-        if self.model.stream:
-            # Stream and accumulate content
-            async for content_chunk in res:
-                msg.content = content_chunk.content
-        else:
-            # Non-streaming: just use the result
-            msg.content = list(res.content) if hasattr(res, 'content') else res
+            finally:
+                # Add to memory (a partial message if the run was cancelled)
+                await self.memory.add(msg)
 
-        # Add to memory
-        await self.memory.add(msg)
+                # Tool calls of an interrupted message will never run
+                if interrupted_by_user:
+                    await self._add_interrupted_tool_results(
+                        self._extract_tool_calls_from_msg(msg))
 
-        return msg
+            span.set(output_chars=payload_size(msg.content) if msg is not None else 0, ttft_ms=timer.ttft_ms, queue_wait_ms=timer.queue_wait_ms)
+            return msg
 
     def _extract_tool_calls_from_msg(self, msg: Msg) -> list:
         """Extract tool calls from a message object."""
@@ -459,6 +562,100 @@ class ReActAgent(ASReActAgent):
 
         return tool_calls
 
+    async def _run_tool_calls(self, tool_calls: list):
+        """
+        Execute the tool calls of one reasoning step, yielding display chunks
+        as each call completes. Consecutive read-only calls run concurrently
+        (at most `max_parallel_tools` at once); any other call runs alone, after
+        the calls before it and before the calls after it, so writes, command
+        execution and browser actions keep their order. Results are added to
+        memory in the original call order; calls that never finished are
+        recorded as interrupted.
+        """
+        semaphore = asyncio.Semaphore(max(self.max_parallel_tools, 1))
+        results: Dict[int, Any] = {}
+        pending: Dict[asyncio.Task, int] = {}
+
+        async def run(tc: Dict) -> Any:
+            async with semaphore:
+                await emit_event({"tool_status": {"id": tc.get('id'), "name": self._tool_name(tc), "status": "running"}})
+                return await self._execute_tool(tc)
+
+        # Batches of call indices: runs of read-only calls, or a single other call
+        batches: list = []
+        for index, tc in enumerate(tool_calls):
+            safe = self._is_parallel_safe(self._tool_name(tc))
+            if safe and batches and batches[-1][1]:
+                batches[-1][0].append(index)
+            else:
+                batches.append(([index], safe))
+
+        try:
+            for tc in tool_calls:
+                tool_args = tc.get('function', {}).get('arguments', '{}')
+
+                # Notify frontend about tool call
+                yield {"content": f"\n\n🔧 **[Tool Call]** `{self._tool_name(tc)}`\n"}
+                if tool_args and tool_args != '{}':
+                    try:
+                        args_display = json.loads(tool_args) if isinstance(
+                            tool_args, str) else tool_args
+                        yield {"content": f"```json\n{json.dumps(args_display, indent=2, ensure_ascii=False)}\n```\n"}
+                    except:
+                        pass
+
+            yield {"content": "⏳ *Executing...*\n"}
+
+            for indices, _ in batches:
+                for index in indices:
+                    pending[asyncio.create_task(run(tool_calls[index]))] = index
+
+                while pending:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in sorted(done, key=pending.get):
+                        index = pending.pop(task)
+                        tc = tool_calls[index]
+                        tool_name = self._tool_name(tc)
+                        try:
+                            tool_result = task.result()
+                        except Exception as e:
+                            results[index] = f"Error: {str(e)}"
+                            await emit_event({"tool_status": {"id": tc.get('id'), "name": tool_name, "status": "error"}})
+                            yield {"content": f"❌ **[Error]** `{tool_name}`: {str(e)}\n"}
+                        else:
+                            results[index] = tool_result
+                            await emit_event({"tool_status": {"id": tc.get('id'), "name": tool_name, "status": "done"}})
+                            yield {"content": f"✅ **[Result]** `{tool_name}`\n{self._format_tool_result(tool_result)}\n"}
+                        yield {"content": "\n---\n"}
+
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client went away: stop the calls that are still running
+            for task, index in pending.items():
+                task.cancel()
+                tc = tool_calls[index]
+                await emit_event({"tool_status": {"id": tc.get('id'), "name": self._tool_name(tc), "status": "cancelled"}})
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+
+        finally:
+            # Every tool_use needs its result, in call order
+            for index, tc in enumerate(tool_calls):
+                if index in results:
+                    await self._add_tool_result_to_memory(tc, results[index])
+                else:
+                    await self._add_interrupted_tool_results([tc])
+
+    @staticmethod
+    def _is_parallel_safe(tool_name: str) -> bool:
+        """Read-only tools (those with a result cache policy) may run concurrently."""
+        if tool_name == READ_TOOL_NAME:
+            return True
+        return tool_name in tool_cache.policies and tool_name not in WRITE_TOOLS
+
+    @staticmethod
+    def _tool_name(tool_call: Dict) -> str:
+        return tool_call.get('function', {}).get('name', tool_call.get('name', 'unknown'))
+
     async def _execute_tool(self, tool_call: Dict) -> Any:
         """Execute a single tool call."""
         # Format for toolkit
@@ -508,7 +705,7 @@ class ReActAgent(ASReActAgent):
         return str(result)
 
     async def _add_tool_result_to_memory(self, tool_call: Dict, result: Any):
-        """Add tool result to agent's memory."""
+        """Add tool result to agent's memory; oversized results are replaced by an artifact preview."""
         from agentscope.message import Msg, ToolResultBlock
 
         tool_name = tool_call.get('name') or tool_call.get(
@@ -517,6 +714,9 @@ class ReActAgent(ASReActAgent):
 
         # Format result as string
         result_str = self._format_tool_result(result)
+        user_context = self.skill_manager.get_user_context() or {}
+        result_str = await artifact_store.offload(
+            result_str, user_context.get("id"), self._artifact_run_id, tool_name)
 
         # Create tool result message
         result_msg = Msg(
@@ -534,6 +734,12 @@ class ReActAgent(ASReActAgent):
 
         await self.memory.add(result_msg)
 
+    async def _add_interrupted_tool_results(self, tool_calls: list):
+        """Record tool calls that will never complete as interrupted by the user."""
+        for tc in tool_calls:
+            await self._add_tool_result_to_memory(
+                tc, "The tool call has been interrupted by the user.")
+
     def _extract_tool_call_from_chunk(self, chunk) -> Optional[Dict]:
         """Extract tool call information from a streaming chunk.
 
@@ -731,124 +937,125 @@ class ReActAgent(ASReActAgent):
         This method wraps the parent _reasoning and intercepts the streaming
         response to extract and forward thinking content.
         """
-        global _thinking_callback
-
         # Import necessary modules from AgentScope
         from agentscope.agent._react_agent import _MemoryMark
         from agentscope.message import ToolResultBlock
 
-        # Handle plan notebook hints (from parent implementation)
-        if self.plan_notebook:
-            # Insert the reasoning hint from the plan notebook
-            hint_msg = await self.plan_notebook.get_current_hint()
-            if self.print_hint_msg and hint_msg:
-                await self.print(hint_msg)
-            await self.memory.add(hint_msg, marks=_MemoryMark.HINT)
-
-        # Convert Msg objects into the required format of the model API
-        prompt = await self.formatter.format(
-            msgs=[
-                Msg("system", self.sys_prompt, "system"),
-                *await self.memory.get_memory(),
-            ],
-        )
-        # Clear the hint messages after use
-        await self.memory.delete_by_mark(mark=_MemoryMark.HINT)
+        with tracer.span("reasoning", tool_choice=tool_choice) as span:
+            # Keep memory within the context budget (before hints are added)
+            sys_prompt = self._turn_sys_prompt or self.sys_prompt
+            await self.context_window.fit(self.memory, sys_prompt)
+
+            # Handle plan notebook hints (from parent implementation)
+            if self.plan_notebook:
+                # Insert the reasoning hint from the plan notebook
+                hint_msg = await self.plan_notebook.get_current_hint()
+                if self.print_hint_msg and hint_msg:
+                    await self.print(hint_msg)
+                await self.memory.add(hint_msg, marks=_MemoryMark.HINT)
 
-        res = await self.model(
-            prompt,
-            tools=self.toolkit.get_json_schemas(),
-            tool_choice=tool_choice,
-        )
+            # Convert Msg objects into the required format of the model API
+            prompt = await self._format_prompt(sys_prompt)
+            # Clear the hint messages after use
+            await self.memory.delete_by_mark(mark=_MemoryMark.HINT)
 
-        # handle output from the model
-        interrupted_by_user = False
-        msg = None
+            with ModelCallTimer() as timer:
+                res = await self.model(
+                    prompt,
+                    tools=self.skill_manager.get_tool_schemas(),
+                    tool_choice=tool_choice,
+                )
 
-        # TTS model context manager
-        from agentscope.agent._utils import _AsyncNullContext
-        tts_context = self.tts_model or _AsyncNullContext()
-        speech = None
+            # handle output from the model
+            interrupted_by_user = False
+            msg = None
 
-        try:
-            async with tts_context:
-                msg = Msg(name=self.name, content=[], role="assistant")
-                if self.model.stream:
-                    async for content_chunk in res:
-                        msg.content = content_chunk.content
-
-                        # Stream thinking content to frontend if callback is set
-                        if _thinking_callback and hasattr(content_chunk, 'content'):
-                            for block in content_chunk.content:
-                                if hasattr(block, 'type') and block.type == 'thinking':
-                                    thinking_text = getattr(block, 'text', '')
-                                    if thinking_text:
-                                        await _thinking_callback(thinking_text)
-                                elif isinstance(block, dict) and block.get('type') == 'thinking':
-                                    thinking_text = block.get('text', '')
-                                    if thinking_text:
-                                        await _thinking_callback(thinking_text)
-
-                        # The speech generated from multimodal (audio) models
-                        speech = msg.get_content_blocks("audio") or None
-
-                        # Push to TTS model if available
-                        if (
-                            self.tts_model
-                            and self.tts_model.supports_streaming_input
-                        ):
-                            tts_res = await self.tts_model.push(msg)
-                            speech = tts_res.content
-
-                        await self.print(msg, False, speech=speech)
+            # TTS model context manager
+            from agentscope.agent._utils import _AsyncNullContext
+            tts_context = self.tts_model or _AsyncNullContext()
+            speech = None
 
-                else:
-                    msg.content = list(res.content)
-
-                if self.tts_model:
-                    # Push to TTS model and block to receive the full speech
-                    # synthesis result
-                    tts_res = await self.tts_model.synthesize(msg)
-                    if self.tts_model.stream:
-                        async for tts_chunk in tts_res:
-                            speech = tts_chunk.content
-                            await self.print(msg, False, speech=speech)
+            try:
+                async with tts_context:
+                    msg = Msg(name=self.name, content=[], role="assistant")
+                    deltas = StreamDeltas()
+                    if self.model.stream:
+                        content_chunk = None
+                        # aclosing() releases the scheduler slot as soon as the
+                        # loop exits (e.g. on cancel), not when the stream is GC'd
+                        async with aclosing(res) as stream:
+                            async for content_chunk in stream:
+                                timer.chunk()
+                                msg.content = content_chunk.content
+
+                                # Stream new thinking text to the current run's event channel
+                                await self._emit_thinking(content_chunk.content, deltas)
+
+                                # The speech generated from multimodal (audio) models
+                                speech = msg.get_content_blocks("audio") or None
+
+                                # Push to TTS model if available
+                                if (
+                                    self.tts_model
+                                    and self.tts_model.supports_streaming_input
+                                ):
+                                    tts_res = await self.tts_model.push(msg)
+                                    speech = tts_res.content
+
+                                await self.print(msg, False, speech=speech)
+
+                        timer.finish(content_chunk)
                     else:
-                        speech = tts_res.content
-
-                await self.print(msg, True, speech=speech)
-
-                # Add a tiny sleep to yield the last message object in the
-                # message queue
-                await asyncio.sleep(0.001)
-
-        except asyncio.CancelledError as e:
-            interrupted_by_user = True
-            raise e from None
+                        msg.content = list(res.content)
+                        await self._emit_thinking(msg.content, deltas)
+                        timer.finish(res)
+                    await self._emit_thinking_final(msg.content)
+
+                    if self.tts_model:
+                        # Push to TTS model and block to receive the full speech
+                        # synthesis result
+                        tts_res = await self.tts_model.synthesize(msg)
+                        if self.tts_model.stream:
+                            async for tts_chunk in tts_res:
+                                speech = tts_chunk.content
+                                await self.print(msg, False, speech=speech)
+                        else:
+                            speech = tts_res.content
 
-        finally:
-            # None will be ignored by the memory
-            await self.memory.add(msg)
-
-            # Post-process for user interruption
-            if interrupted_by_user and msg:
-                # Fake tool results
-                tool_use_blocks = msg.get_content_blocks("tool_use")
-                for tool_call in tool_use_blocks:
-                    msg_res = Msg(
-                        "system",
-                        [
-                            ToolResultBlock(
-                                type="tool_result",
-                                id=tool_call["id"],
-                                name=tool_call["name"],
-                                output="The tool call has been interrupted "
-                                "by the user.",
-                            ),
-                        ],
-                        "system",
-                    )
-                    await self.memory.add(msg_res)
-                    await self.print(msg_res, True)
-
-        return msg
+                    await self.print(msg, True, speech=speech)
+
+                    # Add a tiny sleep to yield the last message object in the
+                    # message queue
+                    await asyncio.sleep(0.001)
+
+            except asyncio.CancelledError as e:
+                interrupted_by_user = True
+                raise e from None
+
+            finally:
+                # None will be ignored by the memory
+                await self.memory.add(msg)
+
+                # Post-process for user interruption
+                if interrupted_by_user and msg:
+                    # Fake tool results
+                    tool_use_blocks = msg.get_content_blocks("tool_use")
+                    for tool_call in tool_use_blocks:
+                        msg_res = Msg(
+                            "system",
+                            [
+                                ToolResultBlock(
+                                    type="tool_result",
+                                    id=tool_call["id"],
+                                    name=tool_call["name"],
+                                    output="The tool call has been interrupted "
+                                    "by the user.",
+                                ),
+                            ],
+                            "system",
+                        )
+                        await self.memory.add(msg_res)
+                        await self.print(msg_res, True)
+
+            span.set(output_chars=payload_size(msg.content) if msg is not None else 0, ttft_ms=timer.ttft_ms, queue_wait_ms=timer.queue_wait_ms)
+            return msg
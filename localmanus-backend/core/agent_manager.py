@@ -6,6 +6,9 @@ from agentscope.memory import InMemoryMemory
 from agents.base_agents import ManagerAgent, PlannerAgent
 from agents.react_agent import ReActAgent
 from core.skill_manager import SkillManager
+from core.agent_pool import AgentPool
+from core.llm_scheduler import LLMScheduler, ScheduledChatModel
+from core.rate_limiter import RateLimiter, RateLimitedChatModel
 from core.config import AGENT_MODEL_CONFIGS
 
 class AgentLifecycleManager:
@@ -26,29 +29,51 @@ class AgentLifecycleManager:
             client_kwargs={"base_url": model_config.get("base_url", os.getenv("OPENAI_API_BASE", "http://localhost:11434/v1"))},
         )
         
+        # Initialize skill manager
+        self.skill_manager = SkillManager()
+
+        # Keep calls within the provider's RPM/TPM quota, retrying 429s with backoff
+        self.rate_limiter = RateLimiter()
+        self.model = RateLimitedChatModel(self.model, self.rate_limiter)
+
+        # All agents share one model client; route its calls through a fair
+        # scheduler so no single user can monopolize the upstream endpoint
+        self.llm_scheduler = LLMScheduler()
+        self.model = ScheduledChatModel(self.model, self.llm_scheduler, key_func=self._current_user_key)
+
         # Use Moonshot-compatible formatter that preserves reasoning_content
         # for thinking-enabled models (e.g., Moonshot/Kimi)
         self.formatter = MoonshotChatFormatter()
         
-        # Initialize skill manager
-        self.skill_manager = SkillManager()
-        
         # Initialize our core agents with the model instance and other requirements
         self.manager = ManagerAgent(model=self.model, formatter=self.formatter)
         self.planner = PlannerAgent(model=self.model, formatter=self.formatter)
         
         # Memory compression settings (configurable via environment variables)
-        enable_compression = os.getenv("ENABLE_MEMORY_COMPRESSION", "true").lower() == "true"
-        compression_threshold = int(os.getenv("MEMORY_COMPRESSION_THRESHOLD", "10000"))
-        keep_recent = int(os.getenv("MEMORY_KEEP_RECENT", "3"))
+        self.enable_compression = os.getenv("ENABLE_MEMORY_COMPRESSION", "true").lower() == "true"
+        self.compression_threshold = int(os.getenv("MEMORY_COMPRESSION_THRESHOLD", "10000"))
+        self.keep_recent = int(os.getenv("MEMORY_KEEP_RECENT", "3"))
         
-        self.react_agent = ReActAgent(
+        self.react_agent = self.create_react_agent()
+
+        # Per-session ReAct agents for concurrent chats; they share the model,
+        # formatter and toolkit above but each has its own memory
+        self.agent_pool = AgentPool(factory=self.create_react_agent)
+
+    def _current_user_key(self) -> str:
+        """Scheduling key of the model call being made: the requesting user's id."""
+        user_context = self.skill_manager.get_user_context() or {}
+        return str(user_context.get("id", "anonymous"))
+
+    def create_react_agent(self) -> ReActAgent:
+        """Create a ReAct agent bound to the shared model, formatter and skill manager."""
+        return ReActAgent(
             model=self.model, 
             formatter=self.formatter, 
             skill_manager=self.skill_manager,
-            enable_compression=enable_compression,
-            compression_threshold=compression_threshold,
-            keep_recent=keep_recent,
+            enable_compression=self.enable_compression,
+            compression_threshold=self.compression_threshold,
+            keep_recent=self.keep_recent,
         )
 
     def get_agents(self):
@@ -0,0 +1,99 @@
+"""
+Agent Pool for LocalManus
+
+Hands out an isolated ReActAgent per chat session so concurrent sessions
+never share agent memory or state. All instances are built by the same
+factory and therefore share the model client, formatter and toolkit; only
+the lightweight per-agent state (memory, system prompt) is separate.
+
+Released agents have their memory cleared and are kept on an idle list
+for reuse. Idle agents beyond `max_idle`, or idle for longer than
+`idle_ttl` seconds, are discarded.
+"""
+
+import asyncio
+import os
+import time
+import logging
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional, Tuple, AsyncIterator
+
+logger = logging.getLogger("LocalManus-AgentPool")
+
+
+class AgentPool:
+    """
+    Pool of per-session agents.
+
+    Usage:
+        pool = AgentPool(factory=lifecycle.create_react_agent)
+        async with pool.acquire(session_id) as agent:
+            async for chunk in agent.run_stream(messages):
+                ...
+
+    Turns of the same session are serialized; different sessions run in parallel.
+    The lock is per process; the orchestrator also holds the session store's
+    turn lock, which serializes turns across workers.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], object],
+        max_idle: Optional[int] = None,
+        idle_ttl: Optional[float] = None,
+    ):
+        self.factory = factory
+        self.max_idle = max_idle if max_idle is not None else int(os.getenv("AGENT_POOL_MAX_IDLE", "8"))
+        self.idle_ttl = idle_ttl if idle_ttl is not None else float(os.getenv("AGENT_POOL_IDLE_TTL", "600"))
+
+        self._idle: List[Tuple[float, object]] = []  # (released_at, agent), oldest first
+        self._session_locks: Dict[str, list] = {}  # session_id -> [lock, waiters]
+        self._active = 0
+
+    @asynccontextmanager
+    async def acquire(self, session_id: str) -> AsyncIterator[object]:
+        """Borrow an agent with empty memory for one turn of `session_id`."""
+        slot = self._session_locks.get(session_id)
+        if slot is None:
+            slot = self._session_locks[session_id] = [asyncio.Lock(), 0]
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                agent = self._take()
+                self._active += 1
+                try:
+                    yield agent
+                finally:
+                    self._active -= 1
+                    await self._release(agent)
+        finally:
+            slot[1] -= 1
+            if slot[1] == 0:
+                self._session_locks.pop(session_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"active": self._active, "idle": len(self._idle)}
+
+    def _take(self):
+        self._prune()
+        if self._idle:
+            _, agent = self._idle.pop()
+            return agent
+        logger.debug("Agent pool empty, creating a new agent instance")
+        return self.factory()
+
+    async def _release(self, agent):
+        try:
+            await agent.memory.clear()
+        except Exception as e:
+            # Never recycle an agent whose state could not be reset
+            logger.error(f"Failed to reset agent memory, discarding instance: {e}")
+            return
+        self._idle.append((time.monotonic(), agent))
+        self._prune()
+
+    def _prune(self):
+        """Drop idle agents that exceed the idle limit or TTL."""
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._idle and (len(self._idle) > self.max_idle or self._idle[0][0] < cutoff):
+            self._idle.pop(0)
@@ -0,0 +1,176 @@
+"""
+Artifact Store for LocalManus
+
+Keeps oversized tool results out of the agent's memory. Memory is resent
+on every reasoning call, so a full file, scraped page or HTML document
+inlined there is paid for again at every later step.
+
+- Results longer than ARTIFACT_THRESHOLD_CHARS are written to disk, one
+  directory per user and run (ARTIFACT_DIR/<user>/<run>/<n>.txt)
+- Memory receives a bounded preview (ARTIFACT_PREVIEW_CHARS, the head and
+  a short tail of the output) plus the artifact handle
+- The `read_artifact` tool pages through an artifact on demand
+  (ARTIFACT_PAGE_CHARS per call by default)
+- Artifacts outlive their run, since handles stay in the saved session
+  memory; directories older than ARTIFACT_TTL seconds are pruned
+"""
+
+import itertools
+import os
+import re
+import shutil
+import time
+import uuid
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional, Tuple
+from agentscope.tool import ToolResponse
+from agentscope.message import TextBlock
+
+logger = logging.getLogger("LocalManus-ArtifactStore")
+
+# <run id>-<sequence number>, e.g. 3f9a2c1b7d4e-2
+_HANDLE = re.compile(r"^([0-9a-f]{12})-(\d+)$")
+# Share of the preview taken from the end of the output (errors, summaries)
+TAIL_SHARE = 0.25
+# Minimum seconds between two prune passes
+PRUNE_INTERVAL = 3600
+
+READ_TOOL_NAME = "read_artifact"
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def _user_key(user_id) -> str:
+    key = re.sub(r"[^0-9A-Za-z_-]", "", str(user_id or ""))
+    return key or "anonymous"
+
+
+class ArtifactStore:
+    """
+    Stores oversized tool outputs on disk and hands out previews.
+
+    Usage:
+        run_id = new_run_id()
+        text = await artifact_store.offload(result_text, user_id, run_id, "file_read")
+        page = await artifact_store.read(handle, user_id, offset=0, limit=4000)
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        threshold_chars: Optional[int] = None,
+        preview_chars: Optional[int] = None,
+        page_chars: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        self.root = Path(root or os.getenv("ARTIFACT_DIR", "artifacts"))
+        self.threshold_chars = threshold_chars or int(os.getenv("ARTIFACT_THRESHOLD_CHARS", "8000"))
+        self.preview_chars = preview_chars or int(os.getenv("ARTIFACT_PREVIEW_CHARS", "2000"))
+        self.page_chars = page_chars or int(os.getenv("ARTIFACT_PAGE_CHARS", "6000"))
+        self.ttl = ttl or float(os.getenv("ARTIFACT_TTL", str(7 * 24 * 3600)))
+        # Run ids are unique, so one process-wide sequence keeps handles unique too
+        self._sequence = itertools.count(1)
+        self._last_prune = 0.0
+
+    async def offload(self, text: str, user_id, run_id: str, tool_name: str = "") -> str:
+        """
+        Return `text` unchanged if it is small enough for memory, otherwise
+        store it and return a preview with the artifact handle.
+        """
+        if len(text) <= self.threshold_chars or tool_name == READ_TOOL_NAME:
+            return text
+        handle = f"{run_id}-{next(self._sequence)}"
+        try:
+            await asyncio.to_thread(self._write, self._path(user_id, handle), text)
+        except Exception as e:
+            # Without an artifact the full result stays in memory
+            logger.warning(f"Failed to store artifact for {tool_name or 'tool'}: {e}")
+            return text
+        logger.info(f"Stored {len(text)} chars from {tool_name or 'tool'} as artifact {handle}")
+        return self.preview(text, handle)
+
+    def preview(self, text: str, handle: str) -> str:
+        tail = int(self.preview_chars * TAIL_SHARE)
+        head = self.preview_chars - tail
+        return (
+            f"{text[:head]}\n\n"
+            f"[... output truncated: {len(text)} characters in total, stored as artifact `{handle}`. "
+            f"Call {READ_TOOL_NAME}(artifact_id=\"{handle}\", offset={head}) to read the rest ...]\n\n"
+            f"{text[-tail:] if tail else ''}"
+        )
+
+    async def read(self, handle: str, user_id, offset: int = 0, limit: Optional[int] = None) -> Tuple[str, int]:
+        """Return (page, total length) of an artifact. Raises KeyError if it does not exist."""
+        if not _HANDLE.match(handle or ""):
+            raise KeyError(handle)
+        path = self._path(user_id, handle)
+        if not path.exists():
+            raise KeyError(handle)
+        text = await asyncio.to_thread(path.read_text, encoding="utf-8")
+        offset = max(offset, 0)
+        limit = min(limit or self.page_chars, self.page_chars)
+        return text[offset:offset + limit], len(text)
+
+    def _path(self, user_id, handle: str) -> Path:
+        run_id, seq = _HANDLE.match(handle).groups()
+        return self.root / _user_key(user_id) / run_id / f"{seq}.txt"
+
+    def _write(self, path: Path, text: str):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+        now = time.time()
+        if now - self._last_prune > PRUNE_INTERVAL:
+            self._last_prune = now
+            self._prune(now)
+
+    def _prune(self, now: float):
+        """Remove run directories not written to for longer than the TTL."""
+        removed = 0
+        for user_dir in self.root.iterdir():
+            if not user_dir.is_dir():
+                continue
+            for run_dir in user_dir.iterdir():
+                try:
+                    if now - run_dir.stat().st_mtime > self.ttl:
+                        shutil.rmtree(run_dir, ignore_errors=True)
+                        removed += 1
+                except OSError:
+                    continue
+        if removed:
+            logger.info(f"Pruned {removed} expired artifact directories")
+
+
+artifact_store = ArtifactStore()
+
+
+async def read_artifact(artifact_id: str, offset: int = 0, limit: int = 0, user_id: str = "") -> ToolResponse:
+    """Reads part of a large tool output that was stored as an artifact. Use it when a
+    tool result was truncated and names an artifact id.
+
+    Args:
+        artifact_id (str): The artifact id given in the truncated tool result
+        offset (int): Character position to start reading from
+        limit (int): Maximum number of characters to return (0 for the default page size)
+        user_id (str): ID of the user
+
+    Returns:
+        ToolResponse: The requested part of the artifact or an error message
+    """
+    try:
+        page, total = await artifact_store.read(artifact_id, user_id, int(offset or 0), int(limit or 0) or None)
+    except KeyError:
+        return ToolResponse(content=[TextBlock(type="text", text=f"Error: Artifact '{artifact_id}' not found or expired.")])
+    except Exception as e:
+        return ToolResponse(content=[TextBlock(type="text", text=f"Error reading artifact: {str(e)}")])
+
+    start = min(max(int(offset or 0), 0), total)
+    end = start + len(page)
+    footer = (
+        f"\n\n[characters {start}-{end} of {total}; "
+        + (f"continue with offset={end}]" if end < total else "end of artifact]")
+    )
+    return ToolResponse(content=[TextBlock(type="text", text=page + footer)])
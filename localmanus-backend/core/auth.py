@@ -52,31 +52,29 @@ def authenticate_user(session: Session, username: str, password: str):
         return None
     return user
 
+def get_user_from_token(session: Session, token: Optional[str]) -> Optional[User]:
+    """Resolve a JWT access token to its user; None if the token is missing or invalid."""
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username: str = payload.get("sub")
+    if username is None:
+        return None
+    return session.exec(select(User).where(User.username == username)).first()
+
 async def get_current_user(
     token: Optional[str] = Depends(oauth2_scheme),
     access_token: Optional[str] = None, # For query parameter (SSE support)
     session: Session = Depends(get_session)
 ):
-    actual_token = token or access_token
-    
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    if not actual_token:
-        raise credentials_exception
-
-    try:
-        payload = jwt.decode(actual_token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = session.exec(select(User).where(User.username == username)).first()
+    user = get_user_from_token(session, token or access_token)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
\ No newline at end of file
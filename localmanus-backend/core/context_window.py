@@ -0,0 +1,194 @@
+"""
+Context Window for LocalManus
+
+Keeps the agent's working memory within a token budget so long
+conversations never hit a hard wall and the prompt size per reasoning step
+stays bounded.
+
+The window consists of:
+- the system prompt (always kept, not part of memory)
+- a rolling summary of trimmed messages (at most `summary_chars` characters)
+- the most recent messages that fit into the remaining budget
+
+Trimming only happens once the memory exceeds the budget, and then cuts it
+down to `TRIM_TARGET` of the budget, so the prompt prefix stays stable (and
+provider-cacheable) for several steps between trims. A tool result is never
+separated from the assistant message that requested it.
+
+With a MemoryCompressor attached, aged messages are additionally summarized
+by the model in the background; finished summaries replace them at the start
+of a later step, and the extractive trim remains the synchronous fallback.
+"""
+
+import os
+import logging
+from typing import Any, List, Optional, Tuple
+from agentscope.message import Msg
+from core.token_counter import token_counter, count_text_tokens
+
+logger = logging.getLogger("LocalManus-ContextWindow")
+
+SUMMARY_NAME = "context_summary"
+SUMMARY_HEADER = "<system-info>Summary of the earlier conversation (older messages were trimmed to fit the context window):\n"
+SUMMARY_FOOTER = "</system-info>"
+
+# Fraction of the budget the memory is cut down to when it overflows
+TRIM_TARGET = 0.75
+# Characters of a trimmed message kept in the summary
+EXCERPT_CHARS = 200
+
+
+def _blocks(msg: Msg) -> List[Any]:
+    return msg.content if isinstance(msg.content, list) else []
+
+
+def _block_get(block: Any, key: str, default: Any = None) -> Any:
+    if isinstance(block, dict):
+        return block.get(key, default)
+    return getattr(block, key, default)
+
+
+def _text_of(msg: Msg) -> str:
+    if isinstance(msg.content, str):
+        return msg.content
+    return "".join(
+        _block_get(b, "text", "") or "" for b in _blocks(msg) if _block_get(b, "type") == "text"
+    )
+
+
+def is_tool_result(msg: Msg) -> bool:
+    return any(_block_get(b, "type") == "tool_result" for b in _blocks(msg))
+
+
+def is_summary(msg: Msg) -> bool:
+    return msg.name == SUMMARY_NAME
+
+
+def estimate_tokens(msg: Msg) -> int:
+    """Token count of a message (cached per message, see core.token_counter)."""
+    return token_counter.count_message(msg)
+
+
+def _excerpt(msg: Msg) -> Optional[str]:
+    """One summary line describing a trimmed message."""
+    if is_tool_result(msg):
+        names = [_block_get(b, "name", "tool") for b in _blocks(msg) if _block_get(b, "type") == "tool_result"]
+        return f"- Tool result received from {', '.join(names)}"
+
+    parts = []
+    text = " ".join(_text_of(msg).split())
+    if text:
+        if len(text) > EXCERPT_CHARS:
+            text = text[:EXCERPT_CHARS] + "..."
+        parts.append(text)
+    tools = [_block_get(b, "name", "tool") for b in _blocks(msg) if _block_get(b, "type") == "tool_use"]
+    if tools:
+        parts.append(f"[called {', '.join(tools)}]")
+    if not parts:
+        return None
+    speaker = "User" if msg.role == "user" else "Assistant" if msg.role == "assistant" else "System"
+    return f"- {speaker}: {' '.join(parts)}"
+
+
+class ContextWindow:
+    """
+    Token-budgeted view over an agent's memory.
+
+    Usage:
+        window = ContextWindow()
+        msgs = await window.fit(agent.memory, sys_prompt)   # trims memory in place if needed
+    """
+
+    def __init__(self, budget: Optional[int] = None, summary_chars: Optional[int] = None, compressor=None):
+        self.compressor = compressor
+        self.budget = budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "16000"))
+        self.summary_chars = summary_chars or int(os.getenv("CONTEXT_SUMMARY_MAX_CHARS", "4000"))
+        # (system prompt, tokens) of the last call; the prompt rarely changes within a run
+        self._sys_prompt_tokens: Tuple[str, int] = ("", 0)
+
+    async def fit(self, memory, sys_prompt: str = "") -> List[Msg]:
+        """
+        Return the memory contents, first trimming the memory in place if it
+        exceeds the budget. Trimmed messages are folded into the rolling summary.
+        With a compressor, a finished background summary is swapped in first and
+        summarization of newly aged messages is started afterwards.
+        """
+        msgs = await memory.get_memory()
+        if self.compressor is not None:
+            compacted = self.compressor.apply(msgs)
+            if compacted is not None:
+                await memory.clear()
+                await memory.add(compacted)
+                msgs = compacted
+
+        msgs = await self._trim(memory, msgs, sys_prompt)
+
+        if self.compressor is not None:
+            self.compressor.schedule(msgs)
+        return msgs
+
+    async def _trim(self, memory, msgs: List[Msg], sys_prompt: str) -> List[Msg]:
+        if sys_prompt != self._sys_prompt_tokens[0]:
+            self._sys_prompt_tokens = (sys_prompt, count_text_tokens(sys_prompt))
+        reserved = self._sys_prompt_tokens[1]
+        if reserved + sum(estimate_tokens(m) for m in msgs) <= self.budget:
+            return msgs
+
+        trimmed, kept = self.split(msgs, int(self.budget * TRIM_TARGET) - reserved)
+        if not trimmed:
+            return msgs
+
+        summary = self.summarize(trimmed)
+        window = [summary, *kept]
+        await memory.clear()
+        await memory.add(window)
+        logger.info(
+            f"Context window trimmed {len(trimmed)} messages "
+            f"(kept {len(kept)}, summary {len(_text_of(summary))} chars)"
+        )
+        return window
+
+    def split(self, msgs: List[Msg], target: int) -> Tuple[List[Msg], List[Msg]]:
+        """Split memory into (trimmed, kept) so that summary plus kept fits `target` tokens."""
+        # Worst case for the summary: CJK text at about one token per character
+        available = target - self.summary_chars
+        cut = len(msgs) - 1  # the latest message is always kept
+        used = estimate_tokens(msgs[cut]) if msgs else 0
+        while cut > 0:
+            tokens = estimate_tokens(msgs[cut - 1])
+            if used + tokens > available or is_summary(msgs[cut - 1]):
+                break
+            used += tokens
+            cut -= 1
+        # Keep tool results together with the message that requested them
+        while cut > 0 and is_tool_result(msgs[cut]):
+            cut -= 1
+        return msgs[:cut], msgs[cut:]
+
+    def summarize(self, trimmed: List[Msg]) -> Msg:
+        """Fold trimmed messages into the rolling summary, dropping its oldest lines first."""
+        lines: List[str] = []
+        for msg in trimmed:
+            if is_summary(msg):
+                body = _text_of(msg)
+                if body.startswith(SUMMARY_HEADER):
+                    body = body[len(SUMMARY_HEADER):]
+                if body.endswith(SUMMARY_FOOTER):
+                    body = body[:-len(SUMMARY_FOOTER)]
+                lines.extend(line for line in body.splitlines() if line)
+                continue
+            line = _excerpt(msg)
+            if line:
+                lines.append(line)
+
+        size = 0
+        start = len(lines)
+        while start > 0 and size + len(lines[start - 1]) + 1 <= self.summary_chars:
+            start -= 1
+            size += len(lines[start]) + 1
+
+        return Msg(
+            name=SUMMARY_NAME,
+            content=SUMMARY_HEADER + "\n".join(lines[start:]) + SUMMARY_FOOTER,
+            role="system",
+        )
@@ -0,0 +1,249 @@
+"""
+DAG Executor for LocalManus
+
+Executes the task DAG produced by the PlannerAgent. Every node is a skill
+invocation through `SkillManager.execute_tool`; a node starts as soon as
+all of its dependencies have succeeded, so independent branches run
+concurrently and a plan finishes in critical-path time.
+
+- Per-node timeout (DAG_NODE_TIMEOUT seconds)
+- Retries with exponential backoff for failed or timed-out nodes
+  (DAG_NODE_RETRIES)
+- At most DAG_MAX_PARALLEL nodes run at once
+- Nodes depending on a failed node are skipped
+- String arguments may reference earlier results as `output_from_<step_id>`
+- Progress is reported as {'node_status': {...}} events
+"""
+
+import asyncio
+import os
+import re
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from core.skill_manager import is_error_text
+
+logger = logging.getLogger("LocalManus-DAGExecutor")
+
+EventCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+_OUTPUT_REF = re.compile(r"output_from_(\w+)")
+
+# Parameters of SkillManager.execute_tool and arguments it injects; never taken from the plan
+_RESERVED_ARGS = ("tool_name", "user_context", "user_id")
+
+
+class DAGNode:
+    """One planner step and its execution state."""
+
+    def __init__(self, step: Dict[str, Any]):
+        self.step_id = str(step.get("step_id"))
+        self.skill = step.get("skill", "")
+        self.args = step.get("args") or {}
+        self.dependencies = [str(d) for d in step.get("dependencies") or []]
+        self.status = "pending"  # pending, queued, running, retrying, succeeded, failed, skipped
+        self.attempts = 0
+        self.output: Optional[str] = None
+        self.error: Optional[str] = None
+        self.duration_s = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "step_id": self.step_id,
+            "skill": self.skill,
+            "status": self.status,
+            "attempts": self.attempts,
+            "output": self.output,
+            "error": self.error,
+            "duration_s": round(self.duration_s, 3),
+        }
+
+
+def _result_text(result: Any) -> str:
+    """Flatten a tool result (text blocks, ToolResponse or plain values) to text."""
+    if isinstance(result, list):
+        return "\n".join(_result_text(r) for r in result)
+    if isinstance(result, dict):
+        return result.get("text", str(result))
+    if hasattr(result, "content"):
+        return _result_text(result.content)
+    if hasattr(result, "text"):
+        return result.text
+    return str(result)
+
+
+def build_nodes(plan: Dict[str, Any]) -> Dict[str, DAGNode]:
+    """Parse and validate a planner DAG; raises ValueError for unknown dependencies or cycles."""
+    steps = plan.get("plan")
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("Plan contains no steps")
+    nodes: Dict[str, DAGNode] = {}
+    for step in steps:
+        node = DAGNode(step)
+        if node.step_id in nodes:
+            raise ValueError(f"Duplicate step_id {node.step_id}")
+        nodes[node.step_id] = node
+    for node in nodes.values():
+        for dep in node.dependencies:
+            if dep not in nodes:
+                raise ValueError(f"Step {node.step_id} depends on unknown step {dep}")
+
+    # Kahn's algorithm: every node must be reachable in topological order
+    indegree = {sid: len(n.dependencies) for sid, n in nodes.items()}
+    ready = [sid for sid, d in indegree.items() if d == 0]
+    visited = 0
+    while ready:
+        sid = ready.pop()
+        visited += 1
+        for other in nodes.values():
+            if sid in other.dependencies:
+                indegree[other.step_id] -= 1
+                if indegree[other.step_id] == 0:
+                    ready.append(other.step_id)
+    if visited != len(nodes):
+        raise ValueError("Plan contains a dependency cycle")
+    return nodes
+
+
+class DAGExecutor:
+    """
+    Runs planner DAGs with maximal parallelism.
+
+    Usage:
+        executor = DAGExecutor(skill_manager)
+        nodes = await executor.run(dag_plan, user_context, on_event=channel.emit)
+    """
+
+    def __init__(
+        self,
+        skill_manager,
+        node_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        max_parallel: Optional[int] = None,
+    ):
+        self.skill_manager = skill_manager
+        self.node_timeout = node_timeout or float(os.getenv("DAG_NODE_TIMEOUT", "300"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("DAG_NODE_RETRIES", "2"))
+        self.max_parallel = max_parallel or int(os.getenv("DAG_MAX_PARALLEL", "4"))
+
+    async def run(
+        self,
+        plan: Dict[str, Any],
+        user_context: Optional[Dict] = None,
+        on_event: Optional[EventCallback] = None,
+    ) -> List[DAGNode]:
+        """Execute every node of `plan` and return them with their final state."""
+        nodes = build_nodes(plan)
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        running: Dict[asyncio.Task, DAGNode] = {}
+
+        async def report(node: DAGNode):
+            if on_event is not None:
+                await on_event({"node_status": node.to_dict()})
+
+        def start_ready():
+            for node in nodes.values():
+                if node.status != "pending":
+                    continue
+                dep_states = [nodes[d].status for d in node.dependencies]
+                if any(s in ("failed", "skipped") for s in dep_states):
+                    node.status = "skipped"
+                    node.error = "A dependency did not succeed"
+                    skipped.append(node)
+                elif all(s == "succeeded" for s in dep_states):
+                    # Running once it gets one of the DAG_MAX_PARALLEL slots
+                    node.status = "queued"
+                    task = asyncio.create_task(self._run_node(node, nodes, user_context, semaphore, report))
+                    running[task] = node
+
+        started_at = time.monotonic()
+        try:
+            while True:
+                skipped: List[DAGNode] = []
+                start_ready()
+                # Skipping a node can make its own dependents skippable
+                while skipped:
+                    for node in skipped:
+                        await report(node)
+                    skipped = []
+                    start_ready()
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    running.pop(task)
+                    task.result()
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        logger.info(
+            f"DAG finished in {time.monotonic() - started_at:.2f}s: "
+            + ", ".join(f"{n.step_id}={n.status}" for n in nodes.values())
+        )
+        return list(nodes.values())
+
+    async def _run_node(self, node: DAGNode, nodes: Dict[str, DAGNode], user_context, semaphore, report):
+        args = self._resolve_args(node.args, nodes)
+        if not isinstance(args, dict):
+            node.status = "failed"
+            node.error = "Step arguments must be an object"
+            await report(node)
+            return
+        async with semaphore:
+            node.status = "running"
+            await report(node)
+            started_at = time.monotonic()
+            while True:
+                node.attempts += 1
+                error = await self._attempt(node, args, user_context)
+                if error is None:
+                    node.status = "succeeded"
+                    break
+                node.error = error
+                if node.attempts > self.max_retries or node.skill not in self.skill_manager.toolkit.tools:
+                    node.status = "failed"
+                    break
+                logger.warning(f"Step {node.step_id} ({node.skill}) failed, retrying: {error}")
+                node.status = "retrying"
+                await report(node)
+                await asyncio.sleep(min(2 ** (node.attempts - 1), 30))
+                node.status = "running"
+            node.duration_s = time.monotonic() - started_at
+        await report(node)
+
+    async def _attempt(self, node: DAGNode, args: Dict[str, Any], user_context) -> Optional[str]:
+        """Run one attempt of a node; returns an error message or None on success."""
+        reserved = [k for k in _RESERVED_ARGS if k in args]
+        if reserved:
+            logger.warning(f"Ignoring reserved arguments {reserved} of step {node.step_id}")
+            args = {k: v for k, v in args.items() if k not in _RESERVED_ARGS}
+        try:
+            result = await asyncio.wait_for(
+                self.skill_manager.execute_tool(node.skill, user_context=user_context, **args),
+                timeout=self.node_timeout,
+            )
+        except asyncio.TimeoutError:
+            return f"Timed out after {self.node_timeout:.0f}s"
+        text = _result_text(result)
+        # Failures are reported as text, classified like the toolkit's tool metrics
+        if is_error_text(text):
+            return text
+        node.output = text
+        node.error = None
+        return None
+
+    def _resolve_args(self, value: Any, nodes: Dict[str, DAGNode]) -> Any:
+        """Replace `output_from_<step_id>` references with the output of that step."""
+        if isinstance(value, dict):
+            return {k: self._resolve_args(v, nodes) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._resolve_args(v, nodes) for v in value]
+        if isinstance(value, str):
+            def substitute(match):
+                node = nodes.get(match.group(1))
+                return node.output if node is not None and node.output is not None else match.group(0)
+            return _OUTPUT_REF.sub(substitute, value)
+        return value
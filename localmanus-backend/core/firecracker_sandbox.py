@@ -9,6 +9,8 @@ import asyncio
 from typing import Dict, Any, Optional, List
 from enum import Enum
 from dataclasses import dataclass
+from core.metrics import SANDBOX_REQUEST_SECONDS
+from core.tracing import tracer, payload_size
 
 logger = logging.getLogger("LocalManus-Sandbox")
 
@@ -42,14 +44,28 @@ class SandboxClient:
         """Make HTTP request to sandbox API"""
         url = f"{self.base_url}{endpoint}"
         kwargs.setdefault('timeout', self.timeout)
+        started = time.perf_counter()
+        status = "error"
         
-        try:
-            response = self.session.request(method, url, **kwargs)
-            response.raise_for_status()
-            return response.json() if response.content else {}
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Sandbox API error: {e}")
-            raise
+        with tracer.span("sandbox_request", method=method, endpoint=endpoint,
+                         request_bytes=payload_size(kwargs.get('json') or kwargs.get('data'))) as span:
+            try:
+                response = self.session.request(method, url, **kwargs)
+                status = str(response.status_code)
+                span.set(status_code=response.status_code, response_bytes=len(response.content))
+                response.raise_for_status()
+                return response.json() if response.content else {}
+            except requests.exceptions.Timeout as e:
+                status = "timeout"
+                logger.error(f"Sandbox API error: {e}")
+                raise
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Sandbox API error: {e}")
+                raise
+            finally:
+                SANDBOX_REQUEST_SECONDS.observe(
+                    time.perf_counter() - started, method=method, endpoint=endpoint, status=status
+                )
     
     def get_context(self) -> Dict[str, Any]:
         """Get sandbox context information"""
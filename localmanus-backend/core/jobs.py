@@ -0,0 +1,351 @@
+"""
+Background Job Queue for LocalManus
+
+Runs long agent workflows outside of the HTTP request that submitted them.
+Submitting returns a job id immediately; clients poll the job or subscribe
+to its events for status, partial output and the final result.
+
+- Jobs are persisted in the SQLite database (`Job` table), so queued work
+  survives worker restarts
+- A bounded pool of worker coroutines (JOB_WORKERS) executes jobs; the
+  number of queued jobs is capped by JOB_MAX_PENDING
+- Jobs are claimed with an atomic status update, so several API processes
+  can share the same table without running a job twice
+- Running jobs record a heartbeat; jobs whose worker died (no heartbeat for
+  JOB_STALE_AFTER seconds) are re-queued, up to JOB_MAX_ATTEMPTS attempts
+- Database errors in a worker (e.g. a locked SQLite file) are logged and
+  retried with backoff instead of stopping the worker
+- Worker and event-stream database calls run in a thread, so a busy SQLite
+  file never stalls the event loop
+- A handler raises JobFailed when its work completed unsuccessfully; the job
+  is marked failed and keeps the handler's result
+"""
+
+import asyncio
+import json
+import os
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+from core.database import engine
+from core.models import Job, JobRead
+
+logger = logging.getLogger("LocalManus-Jobs")
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+# handler(job, emit_output) -> result
+JobHandler = Callable[[Job, Callable[[str], None]], Awaitable[Any]]
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while JOB_MAX_PENDING jobs are already queued."""
+
+
+class JobFailed(Exception):
+    """Raised by a handler whose work completed unsuccessfully; the job fails but keeps `result`."""
+
+    def __init__(self, message: str, result: Any = None):
+        super().__init__(message)
+        self.result = result
+
+
+class _LiveJob:
+    """Progress of a job executing in this process."""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.dirty = False
+        self.changed = asyncio.Event()
+
+    def emit(self, text: str):
+        if text:
+            self.parts.append(text)
+            self.dirty = True
+            self.notify()
+
+    def notify(self):
+        # Wake everyone waiting on the current event and arm a fresh one
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    @property
+    def output(self) -> str:
+        if len(self.parts) > 1:
+            self.parts[:] = ["".join(self.parts)]
+        return self.parts[0] if self.parts else ""
+
+
+def to_read(job: Job) -> JobRead:
+    """Convert a Job row to its API representation."""
+    result = None
+    if job.result is not None:
+        try:
+            result = json.loads(job.result)
+        except ValueError:
+            result = job.result
+    return JobRead(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        output=job.output,
+        result=result,
+        error=job.error,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+class JobQueue:
+    """
+    Persistent job queue with a bounded worker pool.
+
+    Usage:
+        jobs = JobQueue()
+        jobs.register("react", run_react_job)
+        await jobs.start()                               # on application startup
+        job = jobs.submit(user_id, "react", "input")     # returns immediately
+        async for event in jobs.events(job.id): ...      # status / output / result
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        stale_after: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+    ):
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "2"))
+        self.max_pending = max_pending or int(os.getenv("JOB_MAX_PENDING", "100"))
+        self.poll_interval = poll_interval or float(os.getenv("JOB_POLL_INTERVAL", "2"))
+        self.stale_after = stale_after or float(os.getenv("JOB_STALE_AFTER", "120"))
+        self.max_attempts = max_attempts or int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+        self._handlers: Dict[str, JobHandler] = {}
+        self._live: Dict[str, _LiveJob] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        """Recover jobs orphaned by a previous process and start the workers."""
+        self._wakeup = asyncio.Event()
+        await asyncio.to_thread(self._requeue_stale)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Job queue started with {self.workers} workers")
+
+    async def stop(self):
+        """Stop the workers; jobs they were running are handed back to the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ------------------------------------------------------------------
+    # Client API
+    # ------------------------------------------------------------------
+
+    def submit(self, user_id: int, kind: str, input: str) -> Job:
+        """Persist a new job and wake up an idle worker."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        with Session(engine) as session:
+            pending = session.exec(
+                select(func.count()).select_from(Job).where(Job.status == "queued")
+            ).one()
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} jobs are already queued")
+            job = Job(id=uuid.uuid4().hex, user_id=user_id, kind=kind, input=input)
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the current state of a job, including output produced so far."""
+        return self._with_live_output(self._load(job_id))
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        with Session(engine) as session:
+            return session.get(Job, job_id)
+
+    def _with_live_output(self, job: Optional[Job]) -> Optional[Job]:
+        live = self._live.get(job.id) if job is not None else None
+        if live is not None and job.status == "running":
+            job.output = live.output
+        return job
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield {'status': ...} on status changes, {'output': delta} for new output
+        and finally {'status': ..., 'result'|'error': ...} once the job ends.
+        Follows jobs running in other processes by polling the database.
+        """
+        status = None
+        offset = 0
+        while True:
+            live = self._live.get(job_id)
+            waiter = live.changed if live is not None else None
+            job = self._with_live_output(await asyncio.to_thread(self._load, job_id))
+            if job is None:
+                return
+            if len(job.output) < offset:
+                # The job was retried and its output restarted
+                offset = 0
+            if len(job.output) > offset:
+                yield {"output": job.output[offset:]}
+                offset = len(job.output)
+            if job.status in TERMINAL_STATUSES:
+                final = to_read(job)
+                yield {"status": final.status, "result": final.result, "error": final.error}
+                return
+            if job.status != status:
+                status = job.status
+                yield {"status": status}
+
+            if waiter is not None:
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(self.poll_interval)
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    async def _worker(self, index: int):
+        failures = 0
+        while True:
+            try:
+                job = await asyncio.to_thread(self._claim)
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        # Periodic check for jobs whose worker process died
+                        await asyncio.to_thread(self._requeue_stale)
+                else:
+                    await self._execute(job)
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # e.g. "database is locked" with several processes writing; keep the worker alive
+                failures += 1
+                delay = min(self.poll_interval * 2 ** (failures - 1), 60)
+                logger.error(f"Job worker {index} error, retrying in {delay:.0f}s: {e}", exc_info=True)
+                await asyncio.sleep(delay)
+
+    def _claim(self) -> Optional[Job]:
+        """Atomically move the oldest queued job to running."""
+        with Session(engine) as session:
+            while True:
+                job = session.exec(
+                    select(Job).where(Job.status == "queued").order_by(Job.created_at).limit(1)
+                ).first()
+                if job is None:
+                    return None
+                now = datetime.utcnow()
+                claimed = session.execute(
+                    update(Job)
+                    .where(Job.id == job.id, Job.status == "queued")
+                    .values(status="running", attempts=Job.attempts + 1, output="", started_at=now, heartbeat_at=now)
+                ).rowcount
+                session.commit()
+                if claimed:
+                    session.refresh(job)
+                    return job
+                # Another worker won the race; try the next job
+
+    async def _execute(self, job: Job):
+        handler = self._handlers.get(job.kind)
+        live = self._live[job.id] = _LiveJob()
+        logger.info(f"Job {job.id} ({job.kind}) started, attempt {job.attempts}")
+        task = asyncio.create_task(handler(job, live.emit))
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=1.0)
+                try:
+                    await self._heartbeat(job.id, live)
+                except Exception as e:
+                    # A missed heartbeat is harmless unless it lasts JOB_STALE_AFTER
+                    logger.warning(f"Heartbeat of job {job.id} failed: {e}")
+                if done:
+                    break
+            result = task.result()
+            await self._finish(job.id, "succeeded", live.output, result=result)
+            logger.info(f"Job {job.id} succeeded")
+        except JobFailed as e:
+            logger.warning(f"Job {job.id} failed: {e}")
+            await self._finish(job.id, "failed", live.output, result=e.result, error=str(e))
+        except asyncio.CancelledError:
+            task.cancel()
+            # Shutting down: hand the job back so the next start picks it up
+            await asyncio.to_thread(
+                self._update, job.id, status="queued", output=live.output, attempts=max(job.attempts - 1, 0)
+            )
+            raise
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+            await self._finish(job.id, "failed", live.output, error=str(e))
+        finally:
+            self._live.pop(job.id, None)
+            live.notify()
+
+    async def _heartbeat(self, job_id: str, live: _LiveJob):
+        values = {"heartbeat_at": datetime.utcnow()}
+        if live.dirty:
+            values["output"] = live.output
+            live.dirty = False
+        await asyncio.to_thread(self._update, job_id, **values)
+
+    async def _finish(self, job_id: str, status: str, output: str, result: Any = None, error: Optional[str] = None):
+        await asyncio.to_thread(
+            self._update,
+            job_id,
+            status=status,
+            output=output,
+            result=json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+            error=error,
+            finished_at=datetime.utcnow(),
+        )
+
+    def _update(self, job_id: str, **values):
+        with Session(engine) as session:
+            session.execute(update(Job).where(Job.id == job_id).values(**values))
+            session.commit()
+
+    def _requeue_stale(self):
+        """Re-queue running jobs whose worker stopped sending heartbeats."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        with Session(engine) as session:
+            stale = session.exec(
+                select(Job).where(Job.status == "running", Job.heartbeat_at < cutoff)
+            ).all()
+            for job in stale:
+                if job.attempts >= self.max_attempts:
+                    job.status = "failed"
+                    job.error = "Job was interrupted too many times"
+                    job.finished_at = datetime.utcnow()
+                else:
+                    job.status = "queued"
+                logger.warning(f"Job {job.id} lost its worker, now {job.status}")
+                session.add(job)
+            session.commit()
@@ -0,0 +1,189 @@
+"""
+LLM Call Scheduler for LocalManus
+
+Admission control and fair scheduling for calls to the shared chat model.
+
+- Global concurrency cap (LLM_MAX_CONCURRENCY): at most that many model
+  calls (including their streaming responses) are in flight at once
+- Weighted fair queuing across users: each call gets a virtual finish tag
+  of max(virtual time, user's last tag) + cost / weight, and queued calls
+  are admitted in tag order. A user running long tool loops therefore
+  cannot starve users with a single pending call.
+- Per-user weights via LLM_USER_WEIGHTS, e.g. "1:2,7:0.5" (default 1.0)
+- Calls waiting for admission publish their queue position on the current
+  run's event channel as {'queue_status': {...}} events
+"""
+
+import asyncio
+import heapq
+import os
+import logging
+from contextlib import asynccontextmanager
+from itertools import count
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional, Tuple
+from core.run_events import emit_event
+from core.metrics import mark_model_call_admitted
+
+logger = logging.getLogger("LocalManus-LLMScheduler")
+
+
+def _parse_weights(spec: str) -> Dict[str, float]:
+    weights = {}
+    for item in spec.split(","):
+        if ":" in item:
+            key, _, weight = item.partition(":")
+            try:
+                weights[key.strip()] = float(weight)
+            except ValueError:
+                logger.warning(f"Ignoring invalid LLM_USER_WEIGHTS entry: {item}")
+    return weights
+
+
+class LLMScheduler:
+    """
+    Weighted fair queue with a global concurrency cap.
+
+    Usage:
+        scheduler = LLMScheduler()
+        async with scheduler.slot(user_id):
+            ...  # one model call
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, weights: Optional[Dict[str, float]] = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+        self.weights = weights if weights is not None else _parse_weights(os.getenv("LLM_USER_WEIGHTS", ""))
+
+        self._active = 0
+        self._virtual_time = 0.0
+        self._last_tag: Dict[Hashable, float] = {}
+        # (finish tag, arrival order, start tag, admission future)
+        self._queue: List[Tuple[float, int, float, asyncio.Future]] = []
+        self._arrivals = count()
+        self._changed = asyncio.Event()
+
+    def weight(self, key: Hashable) -> float:
+        return max(self.weights.get(str(key), 1.0), 0.01)
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable, cost: float = 1.0) -> AsyncIterator[None]:
+        """Wait for admission of one call by `key`, then hold a concurrency slot."""
+        start = max(self._virtual_time, self._last_tag.get(key, 0.0))
+        tag = start + cost / self.weight(key)
+        self._last_tag[key] = tag
+
+        if self._active < self.max_concurrency and not self._queue:
+            self._admit(start)
+        else:
+            await self._wait(key, tag, start)
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active": self._active, "queued": len(self._queue), "max_concurrency": self.max_concurrency}
+
+    def _admit(self, start: float):
+        self._active += 1
+        self._virtual_time = max(self._virtual_time, start)
+
+    async def _wait(self, key: Hashable, tag: float, start: float):
+        future = asyncio.get_running_loop().create_future()
+        entry = (tag, next(self._arrivals), start, future)
+        heapq.heappush(self._queue, entry)
+        logger.debug(f"LLM call of {key} queued ({len(self._queue)} waiting)")
+
+        reported = None
+        try:
+            while not future.done():
+                position = self._position(entry)
+                if position != reported:
+                    reported = position
+                    await emit_event({"queue_status": {"position": position, "queued": len(self._queue)}})
+                if future.done():
+                    break
+                waiter = self._changed
+                await waiter.wait()
+        except asyncio.CancelledError:
+            if future.done():
+                # Admitted just as we were cancelled: give the slot back
+                self._active -= 1
+                self._dispatch()
+            else:
+                future.cancel()
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._notify()
+            raise
+        await emit_event({"queue_status": {"position": 0, "queued": len(self._queue)}})
+
+    def _position(self, entry: tuple) -> int:
+        return 1 + sum(1 for other in self._queue if other[:2] < entry[:2])
+
+    def _dispatch(self):
+        """Admit queued calls in finish-tag order while slots are free."""
+        admitted = False
+        while self._queue and self._active < self.max_concurrency:
+            _, _, start, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            self._admit(start)
+            future.set_result(None)
+            admitted = True
+        if admitted:
+            self._notify()
+        if not self._queue and len(self._last_tag) > 1000:
+            # Tags at or below the virtual time carry no history any more
+            self._last_tag = {k: t for k, t in self._last_tag.items() if t > self._virtual_time}
+
+    def _notify(self):
+        # Wake everyone waiting on the current event and arm a fresh one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class ScheduledChatModel:
+    """
+    Wraps a chat model so every call goes through an LLMScheduler.
+    Streaming responses keep their slot until the stream is exhausted or closed.
+    All other attributes are delegated to the wrapped model.
+    """
+
+    def __init__(self, model, scheduler: LLMScheduler, key_func: Callable[[], Hashable]):
+        self._model = model
+        self._scheduler = scheduler
+        self._key_func = key_func
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._model, name)
+
+    async def __call__(self, *args, **kwargs) -> Any:
+        slot = self._scheduler.slot(self._key_func())
+        await slot.__aenter__()
+        # Inner wrappers (the rate limiter) mark admission again after their own wait
+        mark_model_call_admitted()
+        try:
+            res = await self._model(*args, **kwargs)
+        except BaseException as e:
+            await slot.__aexit__(type(e), e, e.__traceback__)
+            raise
+        if hasattr(res, "__aiter__"):
+            return self._hold_while_streaming(res, slot)
+        await slot.__aexit__(None, None, None)
+        return res
+
+    @staticmethod
+    async def _hold_while_streaming(res, slot) -> AsyncIterator[Any]:
+        """Callers should close the stream (e.g. `aclosing`) so the slot is freed without waiting for GC."""
+        try:
+            async for chunk in res:
+                yield chunk
+        finally:
+            try:
+                # Close the wrapped stream (and the provider connection) right away
+                aclose = getattr(res, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+            finally:
+                await slot.__aexit__(None, None, None)
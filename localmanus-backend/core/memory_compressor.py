@@ -0,0 +1,144 @@
+"""
+Background Memory Compressor for LocalManus
+
+Incremental, LLM-based summarization of the agent's older memory that
+never blocks a reasoning call.
+
+- Once the messages older than the `keep_recent` most recent ones add up to
+  COMPRESSION_MIN_SEGMENT_TOKENS, they are summarized in a background task
+  with a structured summary schema (CompressionSummarySchema)
+- The finished summary is swapped in atomically at the start of a later
+  reasoning step (`apply`), and only if memory still begins with exactly the
+  summarized messages; otherwise it is discarded
+- Summaries and in-flight work are keyed by message ids and shared between
+  agent instances, so a summary computed near the end of one turn is picked
+  up by whichever pooled agent serves the session's next turn
+- A tool result always stays with the assistant message that requested it
+"""
+
+import asyncio
+import os
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel
+from agentscope.message import Msg
+from core.context_window import SUMMARY_NAME, is_tool_result
+from core.token_counter import token_counter
+from core.run_events import bind_run_channel
+
+logger = logging.getLogger("LocalManus-MemoryCompressor")
+
+# (id of the first, id of the last summarized message)
+SegmentKey = Tuple[str, str]
+
+# Finished summaries waiting to be swapped in, and running summarizations
+_ready: "OrderedDict[SegmentKey, Msg]" = OrderedDict()
+_inflight: Dict[SegmentKey, asyncio.Task] = {}
+MAX_READY_SUMMARIES = 256
+
+
+class MemoryCompressor:
+    """
+    Summarizes old memory segments off the critical path.
+
+    Usage:
+        compressor = MemoryCompressor(model, formatter, CompressionSummarySchema,
+                                      compression_prompt, summary_template)
+        msgs = compressor.apply(msgs) or msgs   # swap in a finished summary
+        compressor.schedule(msgs)               # start summarizing aged messages
+    """
+
+    def __init__(
+        self,
+        model,
+        formatter,
+        summary_schema: Type[BaseModel],
+        compression_prompt: str,
+        summary_template: str,
+        keep_recent: int = 3,
+        min_segment_tokens: Optional[int] = None,
+    ):
+        self.model = model
+        self.formatter = formatter
+        self.summary_schema = summary_schema
+        self.compression_prompt = compression_prompt
+        self.summary_template = summary_template
+        self.keep_recent = keep_recent
+        self.min_segment_tokens = min_segment_tokens or int(os.getenv("COMPRESSION_MIN_SEGMENT_TOKENS", "2000"))
+
+    def segment(self, msgs: List[Msg]) -> List[Msg]:
+        """The aged messages that a summary would replace."""
+        cut = max(len(msgs) - self.keep_recent, 0)
+        # Keep tool results together with the message that requested them
+        while cut > 0 and is_tool_result(msgs[cut]):
+            cut -= 1
+        return msgs[:cut]
+
+    def apply(self, msgs: List[Msg]) -> Optional[List[Msg]]:
+        """
+        Replace the longest summarized prefix of `msgs` with its summary.
+        Returns the new message list, or None if no finished summary applies.
+        """
+        if not msgs or not _ready:
+            return None
+        positions = {m.id: i for i, m in enumerate(msgs)}
+        best = None
+        for key in _ready:
+            first, last = key
+            end = positions.get(last)
+            if positions.get(first) == 0 and end is not None and (best is None or end > best[1]):
+                best = (key, end)
+        if best is None:
+            return None
+        key, end = best
+        summary = _ready.pop(key)
+        logger.info(f"Swapped in background summary for {end + 1} messages")
+        return [summary, *msgs[end + 1:]]
+
+    def schedule(self, msgs: List[Msg]):
+        """Start summarizing the aged segment of `msgs` if it is large enough."""
+        segment = self.segment(msgs)
+        if not segment or (len(segment) == 1 and segment[0].name == SUMMARY_NAME):
+            return
+        key = (segment[0].id, segment[-1].id)
+        if key in _ready or key in _inflight:
+            return
+        # A previous summary at the head of the segment is folded in, but does not count as new work
+        fresh = [m for m in segment if m.name != SUMMARY_NAME]
+        if sum(token_counter.count_message(m) for m in fresh) < self.min_segment_tokens:
+            return
+        task = asyncio.create_task(self._summarize(key, list(segment)))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+
+    async def _summarize(self, key: SegmentKey, segment: List[Msg]):
+        # Background work must not publish events (e.g. queue status) into the user's run
+        bind_run_channel(None)
+        try:
+            prompt = await self.formatter.format(
+                msgs=[*segment, Msg("user", self.compression_prompt, "user")],
+            )
+            res = await self.model(prompt, structured_model=self.summary_schema)
+            if hasattr(res, "__aiter__"):
+                last = None
+                async for chunk in res:
+                    last = chunk
+                res = last
+            fields = getattr(res, "metadata", None) or {}
+            if not fields:
+                logger.warning("Background compression returned no structured summary")
+                return
+            text = self.summary_template.format(
+                **{name: str(fields.get(name, "")) for name in self.summary_schema.model_fields}
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Background compression failed: {e}")
+            return
+
+        _ready[key] = Msg(name=SUMMARY_NAME, content=text, role="system")
+        while len(_ready) > MAX_READY_SUMMARIES:
+            _ready.popitem(last=False)
+        logger.info(f"Background summary ready for {len(segment)} messages")
@@ -0,0 +1,380 @@
+"""
+Metrics for LocalManus
+
+A small in-process metrics registry rendered in the Prometheus text
+exposition format at /metrics. Covers the numbers needed for capacity
+planning and regression detection: time to first token, token throughput,
+model call queue wait, ReAct iterations, tool and sandbox API latency, and chat request counts.
+
+Metrics are per process; with several uvicorn workers, scrape each worker
+(or aggregate in Prometheus).
+
+Usage:
+    from core.metrics import TOOL_CALL_SECONDS
+    with TOOL_CALL_SECONDS.time(tool="web_search"):
+        ...
+    TOOL_CALL_SECONDS.observe(0.25, tool="web_search")
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from core.token_counter import estimate_text_tokens
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets in seconds, from fast tool calls to long model streams
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Current value, either set directly or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], float]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set_function(self, callback: Callable[[], float]):
+        self._callback = callback
+
+    def _samples(self) -> List[str]:
+        if self._callback is not None:
+            try:
+                return [f"{self.name} {_format_value(self._callback())}"]
+            except Exception:
+                return []
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts incl. +Inf, sum, count)
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the enclosed block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ============================================================================
+# Application Metrics
+# ============================================================================
+
+CHAT_REQUESTS = REGISTRY.register(Counter(
+    "localmanus_chat_requests_total",
+    "Chat SSE requests by kind (new, resumed, expired).",
+    ["kind"],
+))
+CHAT_RUN_SECONDS = REGISTRY.register(Histogram(
+    "localmanus_chat_run_duration_seconds",
+    "Wall time of a chat run from start to the last event.",
+))
+ACTIVE_RUNS = REGISTRY.register(Gauge(
+    "localmanus_active_runs",
+    "Chat runs currently executing in this process.",
+))
+
+REACT_RUNS = REGISTRY.register(Counter(
+    "localmanus_react_runs_total",
+    "ReAct runs by outcome (completed, error, cancelled).",
+    ["outcome"],
+))
+REACT_ITERATIONS = REGISTRY.register(Histogram(
+    "localmanus_react_iterations",
+    "Reasoning iterations per ReAct run.",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10),
+))
+REACT_TOOL_CALLS = REGISTRY.register(Histogram(
+    "localmanus_react_tool_calls",
+    "Tool calls per ReAct run.",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21),
+))
+
+LLM_QUEUE_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "localmanus_llm_queue_wait_seconds",
+    "Time a model call waited for a scheduler slot and rate limit quota (including 429 retries).",
+))
+LLM_TTFT_SECONDS = REGISTRY.register(Histogram(
+    "localmanus_llm_time_to_first_token_seconds",
+    "Time from sending a model call to the provider to its first streamed chunk.",
+))
+LLM_CALL_SECONDS = REGISTRY.register(Histogram(
+    "localmanus_llm_call_duration_seconds",
+    "Duration of a model call at the provider, including streaming.",
+))
+LLM_TOKENS_PER_SECOND = REGISTRY.register(Histogram(
+    "localmanus_llm_output_tokens_per_second",
+    "Output token throughput of a model call after the first token.",
+    buckets=(1, 5, 10, 20, 30, 50, 75, 100, 150, 200, 400),
+))
+LLM_OUTPUT_TOKENS = REGISTRY.register(Counter(
+    "localmanus_llm_output_tokens_total",
+    "Output tokens produced by the model (reported or estimated).",
+))
+
+TOOL_CALL_SECONDS = REGISTRY.register(Histogram(
+    "localmanus_tool_call_duration_seconds",
+    "Tool call latency by tool and status (ok, error, cancelled, cached).",
+    ["tool", "status"],
+))
+SANDBOX_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "localmanus_sandbox_request_duration_seconds",
+    "Sandbox API request latency by method, endpoint and status.",
+    ["method", "endpoint", "status"],
+))
+
+LLM_ACTIVE_CALLS = REGISTRY.register(Gauge(
+    "localmanus_llm_active_calls",
+    "Model calls currently holding a scheduler slot.",
+))
+LLM_QUEUED_CALLS = REGISTRY.register(Gauge(
+    "localmanus_llm_queued_calls",
+    "Model calls waiting for a scheduler slot.",
+))
+AGENT_POOL_ACTIVE = REGISTRY.register(Gauge(
+    "localmanus_agent_pool_active",
+    "ReAct agents currently checked out of the pool.",
+))
+AGENT_POOL_IDLE = REGISTRY.register(Gauge(
+    "localmanus_agent_pool_idle",
+    "Idle ReAct agents kept warm in the pool.",
+))
+
+
+# Timer of the model call being issued by the current async task
+_model_call_timer: ContextVar[Optional["ModelCallTimer"]] = ContextVar('model_call_timer', default=None)
+
+
+class ModelCallTimer:
+    """
+    Records latency and throughput of one model call.
+
+    Time spent in the LLM scheduler queue and the rate limiter is recorded as
+    queue wait; TTFT and call duration start once the model wrappers call
+    `mark_model_call_admitted()` right before the provider request. Only
+    calls issued inside the timer's `with` block can mark it.
+
+    Usage:
+        with ModelCallTimer() as timer:
+            res = await model(prompt)
+        async for chunk in res:
+            timer.chunk()
+            last = chunk
+        timer.finish(last)
+    """
+
+    def __init__(self):
+        self.issued = self.started = time.perf_counter()
+        self.first_chunk_at: Optional[float] = None
+        self.finished = False
+        self._token = None
+
+    def __enter__(self) -> "ModelCallTimer":
+        self._token = _model_call_timer.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _model_call_timer.reset(self._token)
+        self._token = None
+
+    def admitted(self):
+        """The call passed admission control; restart the latency clock."""
+        if self.first_chunk_at is None and not self.finished:
+            self.started = time.perf_counter()
+
+    @property
+    def queue_wait_ms(self) -> float:
+        return round((self.started - self.issued) * 1000, 3)
+
+    def chunk(self):
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+            LLM_TTFT_SECONDS.observe(self.first_chunk_at - self.started)
+
+    @property
+    def ttft_ms(self) -> Optional[float]:
+        if self.first_chunk_at is None:
+            return None
+        return round((self.first_chunk_at - self.started) * 1000, 3)
+
+    def finish(self, response=None):
+        """`response` is the final (cumulative) chunk or the non-streaming result."""
+        now = time.perf_counter()
+        self.finished = True
+        LLM_QUEUE_WAIT_SECONDS.observe(self.started - self.issued)
+        LLM_CALL_SECONDS.observe(now - self.started)
+        tokens = self._output_tokens(response)
+        if not tokens:
+            return
+        LLM_OUTPUT_TOKENS.inc(tokens)
+        if self.first_chunk_at is not None and now > self.first_chunk_at:
+            LLM_TOKENS_PER_SECOND.observe(tokens / (now - self.first_chunk_at))
+
+    def _output_tokens(self, response) -> int:
+        usage = getattr(response, "usage", None)
+        reported = getattr(usage, "output_tokens", None) if usage is not None else None
+        if reported:
+            return int(reported)
+        content = getattr(response, "content", None)
+        if not content:
+            return 0
+        # No usage reported: estimate from the generated text and tool arguments
+        parts = []
+        for block in content if isinstance(content, list) else [content]:
+            if isinstance(block, dict):
+                parts.extend(str(block.get(k) or "") for k in ("text", "thinking", "input"))
+            else:
+                parts.append(str(block))
+        return estimate_text_tokens("".join(parts))
+
+
+def mark_model_call_admitted():
+    """Called by model wrappers right before the provider request is sent."""
+    timer = _model_call_timer.get()
+    if timer is not None:
+        timer.admitted()
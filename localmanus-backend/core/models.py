@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, Field
-from typing import Optional
+from typing import Optional, Any
 from datetime import datetime
 
 class UserBase(SQLModel):
@@ -77,3 +77,31 @@ class ProjectRead(SQLModel):
     icon: str
     created_at: datetime
     updated_at: datetime
+
+# Background Job Models
+class Job(SQLModel, table=True):
+    id: str = Field(primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    kind: str  # "task" (workflow planning) or "react" (ReAct loop)
+    input: str
+    status: str = Field(default="queued", index=True)  # queued, running, succeeded, failed
+    output: str = Field(default="")  # Partial output streamed while running
+    result: Optional[str] = None  # JSON-encoded final result
+    error: Optional[str] = None
+    attempts: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None  # Last sign of life from the executing worker
+
+class JobRead(SQLModel):
+    id: str
+    kind: str
+    status: str
+    output: str
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -2,72 +2,79 @@ import json
 import uuid
 import asyncio
 import logging
-from typing import List, Dict, Any, AsyncGenerator, Optional
+from contextlib import aclosing
+from typing import List, Dict, Any, AsyncGenerator, Awaitable, Callable, Optional
 from core.agent_manager import init_agents
+from core.session_store import SessionStore
 from agentscope.message import Msg
-from agents.react_agent import set_thinking_callback
+from core.run_events import RunEventChannel, bind_run_channel
+from core.sse_writer import SSEWriter, DONE_FRAME
+from core.dag_executor import DAGExecutor
+from core.tracing import tracer
 
 logger = logging.getLogger("LocalManus-Orchestrator")
 
+class ReActRunFailed(Exception):
+    """A ReAct run ended with an error; `output` is the content produced until then."""
+
+    def __init__(self, message: str, output: str = ""):
+        super().__init__(message)
+        self.output = output
+
+
 class Orchestrator:
     def __init__(self):
         self.manager, self.planner, self.react_agent = init_agents()
-        self.sessions: Dict[str, List[Msg]] = {}
+        from core.agent_manager import agent_lifecycle
+        self.agent_pool = agent_lifecycle.agent_pool
+        self.sessions = SessionStore()
+        self.dag_executor = DAGExecutor(agent_lifecycle.skill_manager)
 
-    async def chat_stream(self, session_id: str, user_input: str, user_context: Optional[Dict] = None, file_paths: Optional[List[str]] = None) -> AsyncGenerator[str, None]:
+    async def chat_stream(self, session_id: str, user_input: str, user_context: Optional[Dict] = None, file_paths: Optional[List[str]] = None) -> AsyncGenerator[bytes, None]:
+        """
+        Streaming chat as pre-encoded SSE frames, terminated by a [DONE] frame.
+        SSEWriter coalesces content/thinking deltas of `chat_events` into byte frames.
+        """
+        async for frame in SSEWriter().stream(self.chat_events(session_id, user_input, user_context, file_paths)):
+            yield frame
+        yield DONE_FRAME
+
+    async def chat_events(self, session_id: str, user_input: str, user_context: Optional[Dict] = None, file_paths: Optional[List[str]] = None) -> AsyncGenerator[Dict[str, Any], None]:
         """
         Streaming chat with orchestrated ReAct loop and multi-round history.
+        Yields client-facing event dicts; transports (SSE, WebSocket) encode them.
         
         Architecture:
-            - Orchestrator: Session management, SSE formatting, history sync
+            - Orchestrator: Session management, history sync
             - ReActAgent.run_stream: Full ReAct loop, yields content + internal sync events
         
         Internal Protocol:
             - {'content': str} -> Forward to frontend as SSE
             - {'_sync': list} -> Sync messages to session history (internal, not sent to frontend)
             - {'_meta': dict} -> Run metadata for logging (internal, not sent to frontend)
-            - {'thinking': str} -> Thinking content from ReAct agent (forward to frontend)
+            - {'thinking': str} -> New thinking text (delta) from ReAct agent (forward to frontend)
+            - {'thinking_final': dict} -> Full text of a finished thinking block, if THINKING_FINAL_EVENT is set (forward to frontend)
+            - {'tool_status': dict} -> Tool call progress (forward to frontend)
+            - {'queue_status': dict} -> Queue position while waiting for the model (forward to frontend)
+            - {'trace_id': str} -> Id of this run's trace, see /api/traces (forward to frontend)
         """
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
-        
-        history = self.sessions[session_id]
-        
-        # 1. Check round limit
-        if len(history) >= 40: 
-             yield f"data: {json.dumps({'content': '[Error]: Reached maximum conversation limit.'}, ensure_ascii=False)}\n\n"
-             return
-
-        # 2. Append current user message to global history
+        # 1. Append current user message to global history
         user_msg = Msg(name="User", content=user_input, role="user")
-        history.append(user_msg)
-        
-        # Create a queue for thinking content
-        thinking_queue = asyncio.Queue()
-        
-        async def thinking_callback(thinking_text: str):
-            """Callback to receive thinking content from ReAct agent."""
-            await thinking_queue.put(thinking_text)
-        
-        # Set up the thinking callback
-        set_thinking_callback(thinking_callback)
+        await self.sessions.append(session_id, user_msg)
         
+        # Per-run event channel multiplexing agent content, thinking, tool
+        # progress and metadata. The consumer below awaits it, so every event
+        # is forwarded the moment it is produced.
+        channel = RunEventChannel()
+        trace_id = uuid.uuid4().hex
+
         try:
+            yield {'trace_id': trace_id}
+
             # Set user context for skill execution
             from core.agent_manager import agent_lifecycle
             agent_lifecycle.skill_manager.set_user_context(user_context)
             
-            # 3. Prepare message list for the LLM
-            # Convert history to Msg objects if needed
-            msg_history = []
-            for m in history:
-                if isinstance(m, dict):
-                    # Convert dict to Msg object
-                    msg_history.append(Msg(name=m.get("name", "Unknown"), content=m["content"], role=m["role"]))
-                else:
-                    # Already a Msg object
-                    msg_history.append(m)
-            
             # Build system prompt with file paths context
             sys_prompt = self.react_agent._build_system_prompt(user_context)
             
@@ -81,102 +88,244 @@ class Orchestrator:
             
             system_msg = Msg(name="System", content=sys_prompt, role="system")
             
-            # Combine system message with history
-            messages = [system_msg] + msg_history 
+            # 2. Prepare message list for the LLM. The conversation itself lives in the
+            # agent's memory, which the agent keeps within its token-budgeted context
+            # window (rolling summary + recent turns), so only the new turn is passed.
+            messages = [system_msg, user_msg]
 
-            # 4. Stream ReAct loop - handle internal protocol events
-            # Process both thinking content and regular content concurrently
-            thinking_buffer = []
-            thinking_lock = asyncio.Lock()
-            
-            async def collect_thinking():
-                """Collect thinking content from the queue."""
-                while True:
+            # 3. Stream ReAct loop - handle internal protocol events
+            async def pump_agent():
+                """Run the session's agent and forward its chunks into the run's event channel."""
+                # Bound inside this task so concurrent runs never share a channel
+                bind_run_channel(channel)
+                try:
+                    with tracer.start_trace(
+                        "chat_run",
+                        trace_id=trace_id,
+                        user_id=(user_context or {}).get("id"),
+                        session_id=session_id,
+                        input_chars=len(user_input),
+                    ) as root:
+                        await run_agent(root)
+                finally:
+                    channel.close()
+
+            async def run_agent(root):
+                output_chars = 0
+                # Each session gets its own agent instance from the pool; the turn
+                # lock in the session backend keeps other workers off this session
+                async with self.agent_pool.acquire(session_id) as agent, self.sessions.turn_lock(session_id):
+                    # Restore the agent's working memory for this session from the
+                    # shared backend, so a turn can be served by any worker process
+                    # (sessions without a saved memory are seeded from their chat history)
+                    memory, memory_version = await self.sessions.load_memory(session_id)
+                    await agent.memory.add(memory or (await self.sessions.get(session_id))[:-1])
                     try:
-                        # Wait for thinking content with a timeout
-                        thinking_text = await asyncio.wait_for(thinking_queue.get(), timeout=0.05)
-                        async with thinking_lock:
-                            thinking_buffer.append(thinking_text)
-                    except asyncio.TimeoutError:
-                        # No thinking content available, continue loop
-                        await asyncio.sleep(0.01)
-                        continue
-                    except Exception as e:
-                        logger.error(f"Error collecting thinking: {e}")
-                        break
-            
-            # Start thinking collection task
-            thinking_task = asyncio.create_task(collect_thinking())
-            
-            try:
-                async for chunk in self.react_agent.run_stream(messages):
-                    # First, yield any pending thinking content
-                    async with thinking_lock:
-                        for thinking_text in thinking_buffer:
-                            yield f"data: {json.dumps({'thinking': thinking_text}, ensure_ascii=False)}\n\n"
-                        thinking_buffer.clear()
-                    
+                        # aclosing() runs the agent's cleanup before memory is saved,
+                        # even when the run is cancelled between two chunks
+                        async with aclosing(agent.run_stream(messages)) as agent_stream:
+                            async for chunk in agent_stream:
+                                output_chars += len(chunk.get("content") or "")
+                                await channel.emit(chunk)
+                    finally:
+                        root.set(output_chars=output_chars)
+                        saved = await self.sessions.save_memory(
+                            session_id, await agent.memory.get_memory(), expected_version=memory_version
+                        )
+                        if not saved:
+                            logger.warning(
+                                f"Agent memory of session {session_id} was saved by another turn meanwhile; "
+                                "keeping the newer memory"
+                            )
+
+            agent_task = asyncio.create_task(pump_agent())
+
+            async def client_events():
+                """Apply internal protocol events and pass client-facing ones through."""
+                async for chunk in channel:
                     # Handle sync event (internal protocol)
                     if "_sync" in chunk:
                         for m in chunk["_sync"]:
                             role = m.get("role")
                             content = m.get("content")
                             name = "ReActAgent" if role == "assistant" else "System"
-                            history.append(Msg(name=name, content=content, role=role))
+                            await self.sessions.append(session_id, Msg(name=name, content=content, role=role))
                         continue  # Don't forward to frontend
-                    
+
                     # Handle metadata event (internal protocol)
                     if "_meta" in chunk:
                         logger.debug(f"ReAct run metadata: {chunk['_meta']}")
                         continue  # Don't forward to frontend
-                    
-                    # Forward content chunks to frontend as SSE
-                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
-                
-                # Yield any remaining thinking content after stream ends
-                async with thinking_lock:
-                    for thinking_text in thinking_buffer:
-                        yield f"data: {json.dumps({'thinking': thinking_text}, ensure_ascii=False)}\n\n"
-                    thinking_buffer.clear()
+
+                    # Forward content, thinking and tool status chunks to frontend
+                    yield chunk
+
+                # Surface errors raised by the agent task itself
+                await agent_task
+
+            try:
+                async for event in client_events():
+                    yield event
             finally:
-                # Cancel thinking task when stream ends
-                if thinking_task and not thinking_task.done():
-                    thinking_task.cancel()
+                # Stop the agent if the consumer goes away mid-stream. Closing the
+                # channel first releases a producer waiting on a full channel.
+                if not agent_task.done():
+                    channel.close()
+                    agent_task.cancel()
                     try:
-                        await thinking_task
+                        await agent_task
                     except asyncio.CancelledError:
                         pass
-
-            yield "data: [DONE]\n\n"
             
         except Exception as e:
-            logger.error(f"Error in orchestrated chat_stream: {str(e)}", exc_info=True)
+            logger.error(f"Error in orchestrated chat_events: {str(e)}", exc_info=True)
             error_msg = f"\n[Error]: {str(e)}"
-            yield f"data: {json.dumps({'content': error_msg}, ensure_ascii=False)}\n\n"
+            yield {'content': error_msg}
         finally:
             # Clear user context after execution
             from core.agent_manager import agent_lifecycle
             agent_lifecycle.skill_manager.clear_user_context()
-            # Clear thinking callback to avoid memory leaks
-            set_thinking_callback(None)
 
-    async def run_workflow(self, user_input: str):
+    async def plan_workflow(self, user_input: str) -> Dict:
         """
-        Executes the high-level orchestration flow.
+        Analyzes the request and generates the task DAG (without executing it).
         """
+        from core.agent_manager import agent_lifecycle
+
         # 1. Intent Analysis via Manager
-        manager_resp = self.manager.process_input(user_input)
-        intent_data = self._extract_json(manager_resp.content)
+        manager_resp = await self.manager.process_input(user_input)
+        intent_data = self._extract_json(manager_resp.get_text_content())
         
-        # 2. DAG Generation via Planner
-        planner_resp = self.planner.plan(json.dumps(intent_data))
-        dag_plan = self._extract_json(planner_resp.content)
+        # 2. DAG Generation via Planner, restricted to skills that can actually run
+        available_skills = [
+            schema.get("function", schema) for schema in agent_lifecycle.skill_manager.get_tool_schemas()
+        ]
+        planner_resp = await self.planner.plan(
+            json.dumps({"intent": intent_data, "available_skills": available_skills}, ensure_ascii=False)
+        )
+        dag_plan = self._extract_json(planner_resp.get_text_content())
         
         # 3. Add system metadata
-        dag_plan["trace_id"] = str(uuid.uuid4())
+        dag_plan["trace_id"] = tracer.current_trace_id() or str(uuid.uuid4())
         
         return dag_plan
 
+    async def run_workflow(
+        self,
+        user_input: str,
+        user_context: Optional[Dict] = None,
+        on_event: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    ) -> Dict:
+        """
+        Executes the high-level orchestration flow: plan the DAG, then run it.
+        Returns the plan with a `results` entry per step; progress goes to `on_event`.
+        The plan's `trace_id` identifies the run's trace.
+        """
+        # Tool calls of the DAG nodes (and model scheduling) run as this user
+        from core.agent_manager import agent_lifecycle
+        agent_lifecycle.skill_manager.set_user_context(user_context)
+        try:
+            with tracer.start_trace(
+                "workflow", user_id=(user_context or {}).get("id"), input_chars=len(user_input)
+            ) as root:
+                with tracer.span("plan") as span:
+                    dag_plan = await self.plan_workflow(user_input)
+                    span.set(steps=len(dag_plan.get("plan") or []))
+                if on_event is not None:
+                    await on_event({"plan": dag_plan})
+                if "error" in dag_plan:
+                    dag_plan["status"] = "failed"
+                    root.set(outcome="failed")
+                    return dag_plan
+
+                try:
+                    nodes = await self.dag_executor.run(dag_plan, user_context, on_event=on_event)
+                except ValueError as e:
+                    # Malformed plan (no steps, unknown dependencies, cycles)
+                    dag_plan["status"] = "failed"
+                    dag_plan["error"] = str(e)
+                    root.set(outcome="failed")
+                    return dag_plan
+
+                dag_plan["results"] = [node.to_dict() for node in nodes]
+                dag_plan["status"] = "succeeded" if all(n.status == "succeeded" for n in nodes) else "failed"
+                root.set(outcome=dag_plan["status"])
+                return dag_plan
+        finally:
+            agent_lifecycle.skill_manager.clear_user_context()
+
+    async def workflow_events(self, user_input: str, user_context: Optional[Dict] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Streams a workflow run: {'plan'}, {'node_status'} per state change, then {'result'}.
+        """
+        channel = RunEventChannel()
+
+        async def pump_workflow():
+            try:
+                result = await self.run_workflow(user_input, user_context, on_event=channel.emit)
+                await channel.emit({"result": result})
+            finally:
+                channel.close()
+
+        workflow_task = asyncio.create_task(pump_workflow())
+        try:
+            async for event in channel:
+                yield event
+            await workflow_task
+        except Exception as e:
+            logger.error(f"Error in workflow_events: {str(e)}", exc_info=True)
+            yield {"error": str(e)}
+        finally:
+            if not workflow_task.done():
+                channel.close()
+                workflow_task.cancel()
+                try:
+                    await workflow_task
+                except asyncio.CancelledError:
+                    pass
+
+    async def run_react_loop(
+        self,
+        user_input: str,
+        user_context: Optional[Dict] = None,
+        on_output: Optional[Callable[[str], None]] = None,
+    ) -> str:
+        """
+        Runs a single, stateless ReAct turn to completion and returns the full answer.
+        `on_output` receives each content chunk as it is produced (partial output).
+        Raises ReActRunFailed if the agent run ended with an error.
+        """
+        from core.agent_manager import agent_lifecycle
+        agent_lifecycle.skill_manager.set_user_context(user_context)
+        try:
+            sys_prompt = self.react_agent._build_system_prompt(user_context)
+            messages = [
+                Msg(name="System", content=sys_prompt, role="system"),
+                Msg(name="User", content=user_input, role="user"),
+            ]
+            parts = []
+            meta = {}
+            with tracer.start_trace(
+                "react_job", user_id=(user_context or {}).get("id"), input_chars=len(user_input)
+            ):
+                # A throwaway session key: every call gets a fresh agent with empty memory
+                async with self.agent_pool.acquire(f"oneshot:{uuid.uuid4().hex}") as agent:
+                    async with aclosing(agent.run_stream(messages)) as agent_stream:
+                        async for chunk in agent_stream:
+                            if "_meta" in chunk:
+                                meta = chunk["_meta"]
+                                continue
+                            content = chunk.get("content")
+                            if content:
+                                parts.append(content)
+                                if on_output is not None:
+                                    on_output(content)
+            if meta.get("outcome") == "error":
+                raise ReActRunFailed(meta.get("error") or "The agent run failed", output="".join(parts))
+            return "".join(parts)
+        finally:
+            agent_lifecycle.skill_manager.clear_user_context()
+
     def _extract_json(self, text: str) -> Dict:
         """
         Extracts JSON block from agent response.
@@ -0,0 +1,210 @@
+"""
+Provider Rate Limiter for LocalManus
+
+Keeps calls to the chat model within the provider's requests-per-minute
+(RPM) and tokens-per-minute (TPM) quota instead of discovering the limit
+through 429 errors in the middle of a ReAct run.
+
+- Two token buckets (requests, tokens) refilled continuously at
+  LLM_RATE_HEADROOM of the configured quota, so throughput sits just under
+  the limit. Bursts are capped at LLM_RATE_BURST_SECONDS worth of quota.
+- Callers that exceed the budget wait in FIFO order instead of failing
+- Token cost is estimated from the prompt before the call and corrected
+  with the usage reported by the provider afterwards
+- A 429 response pauses all callers for the Retry-After period (or a
+  jittered exponential backoff) before the call is retried, up to
+  LLM_MAX_RETRIES times
+
+A limit of 0 disables the corresponding bucket.
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Optional
+from core.token_counter import estimate_text_tokens
+from core.metrics import mark_model_call_admitted
+
+logger = logging.getLogger("LocalManus-RateLimiter")
+
+
+class TokenBucket:
+    """Continuously refilled bucket; `acquire` waits (FIFO) until enough capacity is available."""
+
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float):
+        # Requests larger than the bucket would never fit; let them drain it instead
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._level >= amount:
+                    self._level -= amount
+                    return
+                await asyncio.sleep((amount - self._level) / self.rate)
+
+    def adjust(self, delta: float):
+        """Return (positive) or charge (negative) capacity after the fact; may go into debt."""
+        self._refill()
+        self._level = min(self.capacity, self._level + delta)
+
+
+def estimate_prompt_tokens(args: tuple, kwargs: dict) -> int:
+    """Rough (CJK-aware) token estimate of a model call's prompt and tool schemas."""
+    payload = [args[0] if args else kwargs.get("messages"), kwargs.get("tools")]
+    return estimate_text_tokens(json.dumps(payload, ensure_ascii=False, default=str))
+
+
+def _usage_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    total = (getattr(usage, "input_tokens", 0) or 0) + (getattr(usage, "output_tokens", 0) or 0)
+    return total or None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds to wait according to the Retry-After headers of a 429 response."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or type(error).__name__ == "RateLimitError"
+
+
+class RateLimiter:
+    """
+    RPM/TPM limiter shared by all calls to one provider endpoint.
+
+    Usage:
+        limiter = RateLimiter()
+        await limiter.acquire(estimated_tokens)
+        ...
+        limiter.reconcile(estimated_tokens, actual_tokens)
+    """
+
+    def __init__(
+        self,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        headroom: Optional[float] = None,
+        burst_seconds: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ):
+        rpm = rpm if rpm is not None else float(os.getenv("LLM_RPM_LIMIT", "0"))
+        tpm = tpm if tpm is not None else float(os.getenv("LLM_TPM_LIMIT", "0"))
+        headroom = headroom or float(os.getenv("LLM_RATE_HEADROOM", "0.9"))
+        burst_seconds = burst_seconds or float(os.getenv("LLM_RATE_BURST_SECONDS", "10"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "5"))
+
+        self.requests = TokenBucket(rpm * headroom, burst_seconds) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm * headroom, burst_seconds) if tpm > 0 else None
+        self._paused_until = 0.0
+
+    async def acquire(self, estimated_tokens: int):
+        """Wait until a call with `estimated_tokens` fits into the quota."""
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None:
+            await self.tokens.acquire(estimated_tokens)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the provider reported the real usage."""
+        if self.tokens is not None and actual_tokens is not None:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """Delay before retrying a rate-limited call; pauses every caller meanwhile."""
+        delay = _retry_after(error)
+        if delay is None:
+            # Full jitter exponential backoff
+            delay = random.uniform(0, min(60.0, 2.0 ** attempt))
+        else:
+            # Spread retries of concurrent callers a little past the server's hint
+            delay += random.uniform(0, 1.0)
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+
+class RateLimitedChatModel:
+    """
+    Wraps a chat model so every call passes the RateLimiter and 429 responses
+    are retried with backoff. All other attributes are delegated to the wrapped model.
+    """
+
+    def __init__(self, model, limiter: RateLimiter):
+        self._model = model
+        self._limiter = limiter
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._model, name)
+
+    async def __call__(self, *args, **kwargs) -> Any:
+        estimated = estimate_prompt_tokens(args, kwargs)
+        attempt = 0
+        while True:
+            await self._limiter.acquire(estimated)
+            mark_model_call_admitted()
+            try:
+                res = await self._model(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self._limiter.max_retries:
+                    raise
+                attempt += 1
+                delay = self._limiter.backoff(attempt, e)
+                logger.warning(f"Model rate limited, retry {attempt}/{self._limiter.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            if hasattr(res, "__aiter__"):
+                return self._reconcile_when_done(res, estimated)
+            self._limiter.reconcile(estimated, _usage_tokens(res))
+            return res
+
+    async def _reconcile_when_done(self, res, estimated: int) -> AsyncIterator[Any]:
+        last = None
+        try:
+            async for chunk in res:
+                last = chunk
+                yield chunk
+        finally:
+            # Streaming chunks are cumulative; the last one carries the usage
+            self._limiter.reconcile(estimated, _usage_tokens(last))
+            aclose = getattr(res, "aclose", None)
+            if aclose is not None:
+                await aclose()
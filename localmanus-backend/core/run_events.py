@@ -0,0 +1,132 @@
+"""
+Run Event Channel for LocalManus
+
+A per-run event channel carrying everything an agent run streams to its
+client: content chunks, thinking text, tool progress and run metadata.
+
+The active channel is stored in a ContextVar, so it is scoped to the asyncio
+task executing the run (and every coroutine it awaits). Concurrent runs each
+bind their own channel and can never write into each other's stream.
+
+The channel is bounded (RUN_CHANNEL_MAX_EVENTS). When the consumer falls
+behind and the channel is full, a content/thinking delta is merged into the
+newest queued delta of the same kind (up to RUN_CHANNEL_MERGE_BYTES); any
+other event makes the producer wait until the consumer catches up. Memory per
+run therefore stays flat however fast the model produces tokens. A producer
+that is being cancelled never waits: its events are dropped when the channel
+is full, so cleanup code that emits (e.g. run metadata) cannot hang.
+
+Usage:
+    channel = RunEventChannel()
+
+    async def run():
+        bind_run_channel(channel)          # inside the run's own task
+        try:
+            ...                            # agent code calls emit_event(...)
+        finally:
+            channel.close()
+
+    task = asyncio.create_task(run())
+    async for event in channel:
+        ...
+"""
+
+import asyncio
+import os
+import logging
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+from core.sse_writer import mergeable_key
+
+logger = logging.getLogger("LocalManus-RunEvents")
+
+# Channel of the run executing in the current async task
+_run_channel_var: ContextVar[Optional["RunEventChannel"]] = ContextVar('run_event_channel', default=None)
+
+class RunEventChannel:
+    """Bounded single-consumer event stream for one agent run."""
+
+    def __init__(self, max_events: Optional[int] = None, merge_bytes: Optional[int] = None):
+        self.max_events = max_events or int(os.getenv("RUN_CHANNEL_MAX_EVENTS", "256"))
+        self.merge_bytes = merge_bytes or int(os.getenv("RUN_CHANNEL_MERGE_BYTES", "16384"))
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._closed = False
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self.merged = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    async def emit(self, event: Dict[str, Any]):
+        """
+        Publish an event to the run's consumer. Events after close are dropped.
+        Waits while the channel is full, unless the event can be merged or the
+        producing task is being cancelled (then the event is dropped).
+        """
+        while not self._closed and len(self._events) >= self.max_events:
+            if self._merge_into_tail(event):
+                return
+            task = asyncio.current_task()
+            if task is not None and task.cancelling():
+                logger.debug("Dropped event from a cancelled producer on a full channel")
+                return
+            self._writable.clear()
+            await self._writable.wait()
+        if self._closed:
+            return
+        self._events.append(event)
+        self._readable.set()
+
+    def close(self):
+        """Signal the consumer that the run has finished; queued events are still delivered."""
+        if not self._closed:
+            self._closed = True
+            self._readable.set()
+            self._writable.set()
+
+    def _merge_into_tail(self, event: Dict[str, Any]) -> bool:
+        key = mergeable_key(event)
+        if key is None:
+            return False
+        tail = self._events[-1]
+        if mergeable_key(tail) != key or len(tail[key]) + len(event[key]) > self.merge_bytes:
+            return False
+        self._events[-1] = {key: tail[key] + event[key]}
+        self.merged += 1
+        return True
+
+    async def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            if self._events:
+                event = self._events.popleft()
+                self._writable.set()
+                yield event
+            elif self._closed:
+                return
+            else:
+                self._readable.clear()
+                await self._readable.wait()
+
+
+def bind_run_channel(channel: Optional[RunEventChannel]):
+    """Bind a channel to the current async task (and tasks created from it)."""
+    return _run_channel_var.set(channel)
+
+
+def get_run_channel() -> Optional[RunEventChannel]:
+    """Return the channel of the current run, if any."""
+    return _run_channel_var.get()
+
+
+async def emit_event(event: Dict[str, Any]):
+    """Publish an event on the current run's channel; a no-op outside a run."""
+    channel = _run_channel_var.get()
+    if channel is not None:
+        await channel.emit(event)
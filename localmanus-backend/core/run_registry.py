@@ -0,0 +1,224 @@
+"""
+Resumable Run Registry for LocalManus
+
+Decouples a chat run from the HTTP connection that started it, so a client
+that loses its SSE connection can re-attach to the still-running run instead
+of starting the whole ReAct loop again.
+
+- Every SSE frame of a run gets an id of the form `<run_id>:<seq>`
+- The most recent frames are kept in a bounded per-run replay ring buffer
+- A reconnect carrying `Last-Event-ID` receives only the frames it missed,
+  then continues with the live stream
+- Idle subscriptions get periodic SSE comment heartbeats so proxies do not
+  cut the connection during long tool executions
+- Finished runs stay replayable for a short retention window
+- A run never gets more than half a replay buffer ahead of its slowest
+  attached client; beyond that the run waits, so a slow client applies
+  backpressure instead of silently losing frames
+- When the last client disconnects, the run is cancelled unless a client
+  re-attaches within a short grace period, so abandoned runs stop spending
+  LLM tokens and sandbox capacity
+"""
+
+import asyncio
+import os
+import uuid
+import logging
+from collections import deque
+from itertools import count, islice
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple, Any
+
+logger = logging.getLogger("LocalManus-RunRegistry")
+
+HEARTBEAT_FRAME = b": keep-alive\n\n"
+
+
+class ResumableRun:
+    """A running chat turn whose SSE frames can be replayed to reconnecting clients."""
+
+    def __init__(self, run_id: str, owner: Any, buffer_size: int):
+        self.run_id = run_id
+        self.owner = owner
+        self._id_prefix = run_id.encode("ascii")
+        self._buffer: Deque[Tuple[int, bytes]] = deque(maxlen=buffer_size)
+        self._seq = 0
+        self._new_frame = asyncio.Event()
+        self._progress = asyncio.Event()
+        self._cursors: Dict[int, int] = {}  # subscription id -> last delivered seq
+        self._subscription_ids = count()
+        self.max_lag = max(buffer_size // 2, 1)
+        self.task: Optional[asyncio.Task] = None
+        self.done = False
+        self.subscribers = 0
+        self._abandon_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def publish(self, frame: bytes):
+        """Assign the next event id to an encoded SSE frame and wake up subscribers."""
+        self._seq += 1
+        self._buffer.append((self._seq, b"id: %s:%d\n%s" % (self._id_prefix, self._seq, frame)))
+        self._notify()
+
+    async def wait_for_room(self):
+        """Wait until every attached subscriber is within `max_lag` frames of the head."""
+        while self._cursors and min(self._cursors.values()) < self._seq - self.max_lag:
+            self._progress.clear()
+            await self._progress.wait()
+
+    def finish(self):
+        self.done = True
+        self._notify()
+
+    def _notify(self):
+        # Wake everyone waiting on the current event and arm a fresh one
+        self._new_frame.set()
+        self._new_frame = asyncio.Event()
+
+    def _frames_after(self, seq: int):
+        if not self._buffer:
+            return []
+        first_seq = self._buffer[0][0]
+        if seq + 1 < first_seq:
+            logger.warning(
+                f"Run {self.run_id}: client resumed at {seq} but replay buffer starts at {first_seq}"
+            )
+        start = max(seq + 1 - first_seq, 0)
+        return list(islice(self._buffer, start, None))
+
+    async def subscribe(
+        self,
+        last_seq: int = 0,
+        heartbeat: float = 15.0,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Yield frames after `last_seq`, then follow the live run until it finishes.
+        Stops early once `is_disconnected()` reports that the client went away.
+        """
+        cursor = last_seq
+        token = next(self._subscription_ids)
+        self._cursors[token] = cursor
+        try:
+            while True:
+                for seq, frame in self._frames_after(cursor):
+                    yield frame
+                    # Only count a frame once the transport has taken it
+                    cursor = self._cursors[token] = seq
+                    self._progress.set()
+                if self.done and cursor >= self._seq:
+                    return
+                waiter = self._new_frame
+                if cursor < self._seq:
+                    continue
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        return
+                    yield HEARTBEAT_FRAME
+        finally:
+            self._cursors.pop(token, None)
+            self._progress.set()
+
+
+class RunRegistry:
+    """
+    Keeps track of in-flight and recently finished runs.
+
+    Usage:
+        run = registry.start(owner=user_id, frames=orchestrator.chat_stream(...))
+        return StreamingResponse(registry.stream(run))
+
+        # on reconnect with Last-Event-ID "<run_id>:<seq>"
+        run, seq = registry.resume(owner=user_id, last_event_id=header)
+    """
+
+    def __init__(
+        self,
+        buffer_size: Optional[int] = None,
+        retention: Optional[float] = None,
+        heartbeat: Optional[float] = None,
+        disconnect_grace: Optional[float] = None,
+    ):
+        self.buffer_size = buffer_size or int(os.getenv("SSE_REPLAY_BUFFER", "1000"))
+        self.retention = retention if retention is not None else float(os.getenv("SSE_RUN_RETENTION", "60"))
+        self.heartbeat = heartbeat or float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+        self.disconnect_grace = (
+            disconnect_grace if disconnect_grace is not None
+            else float(os.getenv("SSE_DISCONNECT_GRACE", "10"))
+        )
+        self._runs: Dict[str, ResumableRun] = {}
+
+    def start(self, owner: Any, frames: AsyncIterator[bytes]) -> ResumableRun:
+        """Run `frames` in the background and buffer every frame it produces."""
+        run = ResumableRun(uuid.uuid4().hex, owner, self.buffer_size)
+        self._runs[run.run_id] = run
+        run.task = asyncio.create_task(self._drive(run, frames))
+        return run
+
+    def resume(self, owner: Any, last_event_id: Optional[str]) -> Tuple[Optional[ResumableRun], int]:
+        """
+        Resolve a `Last-Event-ID` value to the run it belongs to.
+        Returns (None, 0) if the id is malformed, unknown or owned by someone else.
+        """
+        if not last_event_id or ":" not in last_event_id:
+            return None, 0
+        run_id, _, seq = last_event_id.rpartition(":")
+        run = self._runs.get(run_id)
+        if run is None or run.owner != owner:
+            return None, 0
+        try:
+            return run, int(seq)
+        except ValueError:
+            return run, 0
+
+    async def stream(
+        self,
+        run: ResumableRun,
+        last_seq: int = 0,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ) -> AsyncIterator[bytes]:
+        """Stream a run to one client, tracking it as a subscriber while connected."""
+        self._attach(run)
+        try:
+            async for frame in run.subscribe(last_seq, self.heartbeat, is_disconnected):
+                yield frame
+        finally:
+            self._detach(run)
+
+    def _attach(self, run: ResumableRun):
+        run.subscribers += 1
+        if run._abandon_handle is not None:
+            run._abandon_handle.cancel()
+            run._abandon_handle = None
+
+    def _detach(self, run: ResumableRun):
+        run.subscribers -= 1
+        if run.subscribers == 0 and not run.done:
+            run._abandon_handle = asyncio.get_running_loop().call_later(
+                self.disconnect_grace, self._abandon, run
+            )
+
+    def _abandon(self, run: ResumableRun):
+        """Cancel a run nobody re-attached to within the grace period."""
+        run._abandon_handle = None
+        if run.subscribers == 0 and not run.done and run.task is not None:
+            logger.info(f"Cancelling run {run.run_id}: client disconnected")
+            run.task.cancel()
+
+    async def _drive(self, run: ResumableRun, frames: AsyncIterator[bytes]):
+        try:
+            async for frame in frames:
+                await run.wait_for_room()
+                run.publish(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Run {run.run_id} failed: {e}", exc_info=True)
+        finally:
+            run.finish()
+            # Keep the finished run around briefly so late reconnects can replay its tail
+            asyncio.get_running_loop().call_later(self.retention, self._runs.pop, run.run_id, None)
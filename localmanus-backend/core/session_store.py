@@ -0,0 +1,567 @@
+"""
+Session Store for LocalManus
+
+Keeps recently used chat histories in memory on top of a shared, pluggable
+persistence backend so that any API worker can serve any turn of a session.
+
+Backends:
+- SQLite (default): a local database file in WAL mode, shared by all
+  uvicorn workers on the host
+- Redis: any Redis-protocol server, for stores shared across hosts
+
+Cache:
+- LRU eviction once the number of cached sessions exceeds `max_sessions`
+- Idle eviction for sessions untouched for longer than `idle_ttl` seconds
+- Memory budget: evicts least recently used sessions until the estimated
+  size of all cached histories fits into `memory_budget` bytes
+
+History messages are append-only records (SQLite rows, a Redis list), so
+workers appending to the same session never overwrite each other. A cached
+history remembers the cursor of its last record and pulls only newer
+records on access, which keeps workers coherent when consecutive turns land
+on different processes. Agent memory is one versioned blob per session,
+written once per turn. Backend I/O runs in a thread, off the event loop.
+
+Turns of one session are serialized across workers by a lock in the backend
+(`turn_lock`), held for the whole turn and renewed while it runs; a lock
+whose worker died expires after SESSION_LOCK_TTL seconds. Agent memory is
+saved with a compare-and-swap on its version, so a turn whose lock expired
+cannot overwrite the memory saved by a newer turn.
+
+Still per process, so these need sticky routing by session to work across
+workers:
+- live runs of the RunRegistry: a Last-Event-ID reconnect that lands on
+  another worker finds no run and gets 204
+- live output of the JobQueue (`_live`); job status itself is in the database
+- finished background summaries of the MemoryCompressor (a turn on another
+  worker just summarizes again)
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import socket
+import threading
+import time
+import uuid
+import zlib
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
+from agentscope.message import Msg
+
+logger = logging.getLogger("LocalManus-SessionStore")
+
+# Rough per-message bookkeeping overhead (Msg object, id, timestamp, dict)
+_MSG_OVERHEAD_BYTES = 512
+
+
+def _msg_to_dict(msg: Any) -> Dict[str, Any]:
+    """Convert a history entry into a JSON-serializable dict."""
+    if isinstance(msg, dict):
+        return {
+            "name": msg.get("name", "Unknown"),
+            "role": msg.get("role", "user"),
+            "content": msg.get("content", ""),
+        }
+    return {"name": msg.name, "role": msg.role, "content": msg.content}
+
+
+def _dict_to_msg(data: Dict[str, Any]) -> Msg:
+    return Msg(name=data.get("name", "Unknown"), content=data.get("content", ""), role=data.get("role", "user"))
+
+
+def _estimate_size(msg: Any) -> int:
+    """Estimate the in-memory footprint of a history entry in bytes."""
+    content = msg.get("content", "") if isinstance(msg, dict) else msg.content
+    if isinstance(content, str):
+        return len(content.encode("utf-8")) + _MSG_OVERHEAD_BYTES
+    return len(json.dumps(content, ensure_ascii=False, default=str).encode("utf-8")) + _MSG_OVERHEAD_BYTES
+
+
+def _encode(items: List[Dict[str, Any]]) -> bytes:
+    return zlib.compress(json.dumps(items, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def _decode(data: bytes) -> List[Dict[str, Any]]:
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+# ============================================================================
+# Persistence Backends
+# ============================================================================
+
+class SessionBackend:
+    """
+    Versioned blob store, append-only record lists and expiring locks, shared
+    by all workers. Every successful `save` bumps the version of the key;
+    every `append_item` advances the cursor of its list.
+    """
+
+    def load(self, key: str) -> Optional[Tuple[int, bytes]]:
+        """Return (version, data) for a key, or None if it does not exist."""
+        raise NotImplementedError
+
+    def version(self, key: str) -> int:
+        """Return the current version of a key (0 if it does not exist)."""
+        raise NotImplementedError
+
+    def save(self, key: str, data: bytes, expected_version: Optional[int] = None) -> Optional[int]:
+        """
+        Store data under a key and return the new version. With `expected_version`,
+        only store if the key is still at that version (0: does not exist) and
+        return None otherwise.
+        """
+        raise NotImplementedError
+
+    def append_item(self, key: str, data: bytes) -> int:
+        """Append a record to the list under a key and return the list's new cursor."""
+        raise NotImplementedError
+
+    def items_since(self, key: str, cursor: int) -> Tuple[List[bytes], int]:
+        """Return the records appended after `cursor` (0 for all) and the latest cursor."""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """Delete the blob and the record list of a key."""
+        raise NotImplementedError
+
+    def try_lock(self, key: str, owner: str, ttl: float) -> bool:
+        """Take or renew the lock `key` for `owner` for `ttl` seconds; False if someone else holds it."""
+        raise NotImplementedError
+
+    def unlock(self, key: str, owner: str):
+        """Release the lock `key` if `owner` still holds it."""
+        raise NotImplementedError
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """SQLite backend in WAL mode so several worker processes can share one file."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        # One connection shared by the threads the store runs backend calls in
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=30000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_records ("
+            "key TEXT PRIMARY KEY, "
+            "version INTEGER NOT NULL, "
+            "data BLOB NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_items ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "key TEXT NOT NULL, "
+            "data BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_session_items_key ON session_items (key, seq)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_locks ("
+            "key TEXT PRIMARY KEY, "
+            "owner TEXT NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+
+    def load(self, key: str) -> Optional[Tuple[int, bytes]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, data FROM session_records WHERE key = ?", (key,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def version(self, key: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM session_records WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def save(self, key: str, data: bytes, expected_version: Optional[int] = None) -> Optional[int]:
+        with self._lock:
+            if expected_version is None:
+                row = self._conn.execute(
+                    "INSERT INTO session_records (key, version, data, updated_at) VALUES (?, 1, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET version = version + 1, data = excluded.data, "
+                    "updated_at = excluded.updated_at "
+                    "RETURNING version",
+                    (key, data, time.time()),
+                ).fetchone()
+            elif expected_version == 0:
+                row = self._conn.execute(
+                    "INSERT INTO session_records (key, version, data, updated_at) VALUES (?, 1, ?, ?) "
+                    "ON CONFLICT(key) DO NOTHING RETURNING version",
+                    (key, data, time.time()),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "UPDATE session_records SET version = version + 1, data = ?, updated_at = ? "
+                    "WHERE key = ? AND version = ? RETURNING version",
+                    (data, time.time(), key, expected_version),
+                ).fetchone()
+        return row[0] if row else None
+
+    def append_item(self, key: str, data: bytes) -> int:
+        # The global row id doubles as the cursor; it only grows
+        with self._lock:
+            return self._conn.execute(
+                "INSERT INTO session_items (key, data) VALUES (?, ?)", (key, data)
+            ).lastrowid
+
+    def items_since(self, key: str, cursor: int) -> Tuple[List[bytes], int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, data FROM session_items WHERE key = ? AND seq > ? ORDER BY seq",
+                (key, cursor),
+            ).fetchall()
+        return [row[1] for row in rows], (rows[-1][0] if rows else cursor)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM session_records WHERE key = ?", (key,))
+            self._conn.execute("DELETE FROM session_items WHERE key = ?", (key,))
+
+    def try_lock(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO session_locks (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE session_locks.owner = excluded.owner OR session_locks.expires_at < ?",
+                (key, owner, now + ttl, now),
+            )
+        return cursor.rowcount == 1
+
+    def unlock(self, key: str, owner: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM session_locks WHERE key = ? AND owner = ?", (key, owner))
+
+
+# Atomic compare-and-swap on the version field of a session hash
+_REDIS_SAVE_IF_VERSION = """
+local version = tonumber(redis.call('HGET', KEYS[1], 'version') or '0')
+if version ~= tonumber(ARGV[2]) then
+    return nil
+end
+version = redis.call('HINCRBY', KEYS[1], 'version', 1)
+redis.call('HSET', KEYS[1], 'data', ARGV[1])
+return version
+"""
+
+# Take the lock if it is free, renew it if the caller already holds it
+_REDIS_TRY_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+_REDIS_UNLOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisSessionBackend(SessionBackend):
+    """Backend for any Redis-protocol server; each key is a hash of {version, data}."""
+
+    def __init__(self, url: str, prefix: str = "localmanus:session:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "SESSION_BACKEND=redis requires the redis package. Run: pip install redis"
+            ) from e
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._client.ping()
+        self._save_if_version = self._client.register_script(_REDIS_SAVE_IF_VERSION)
+        self._try_lock = self._client.register_script(_REDIS_TRY_LOCK)
+        self._unlock = self._client.register_script(_REDIS_UNLOCK)
+
+    def load(self, key: str) -> Optional[Tuple[int, bytes]]:
+        version, data = self._client.hmget(self.prefix + key, "version", "data")
+        if version is None or data is None:
+            return None
+        return int(version), data
+
+    def version(self, key: str) -> int:
+        version = self._client.hget(self.prefix + key, "version")
+        return int(version) if version is not None else 0
+
+    def save(self, key: str, data: bytes, expected_version: Optional[int] = None) -> Optional[int]:
+        if expected_version is not None:
+            version = self._save_if_version(keys=[self.prefix + key], args=[data, expected_version])
+            return int(version) if version is not None else None
+        pipe = self._client.pipeline(transaction=True)
+        pipe.hincrby(self.prefix + key, "version", 1)
+        pipe.hset(self.prefix + key, "data", data)
+        version, _ = pipe.execute()
+        return int(version)
+
+    def append_item(self, key: str, data: bytes) -> int:
+        # RPUSH is atomic; the list length is the cursor
+        return int(self._client.rpush(self.prefix + "items:" + key, data))
+
+    def items_since(self, key: str, cursor: int) -> Tuple[List[bytes], int]:
+        items = self._client.lrange(self.prefix + "items:" + key, cursor, -1)
+        return list(items), cursor + len(items)
+
+    def delete(self, key: str):
+        self._client.delete(self.prefix + key, self.prefix + "items:" + key)
+
+    def try_lock(self, key: str, owner: str, ttl: float) -> bool:
+        return bool(self._try_lock(keys=[self.prefix + "lock:" + key], args=[owner, int(ttl * 1000)]))
+
+    def unlock(self, key: str, owner: str):
+        self._unlock(keys=[self.prefix + "lock:" + key], args=[owner])
+
+
+def create_session_backend() -> SessionBackend:
+    """Create the backend selected by SESSION_BACKEND (sqlite or redis)."""
+    backend = os.getenv("SESSION_BACKEND", "sqlite").lower()
+    if backend == "redis":
+        url = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+        logger.info(f"Using Redis session backend at {url}")
+        return RedisSessionBackend(url)
+    db_path = os.getenv("SESSION_STORE_PATH", "sessions.db")
+    logger.info(f"Using SQLite session backend at {db_path}")
+    return SQLiteSessionBackend(db_path)
+
+
+# ============================================================================
+# Session Store
+# ============================================================================
+
+class _CachedSession:
+    __slots__ = ("messages", "size", "last_access", "cursor")
+
+    def __init__(self, messages: List[Msg], cursor: int):
+        self.messages = messages
+        self.size = sum(_estimate_size(m) for m in messages)
+        self.last_access = time.monotonic()
+        self.cursor = cursor
+
+
+class SessionStore:
+    """
+    Bounded in-memory cache of chat histories over a shared backend.
+
+    Usage:
+        store = SessionStore()
+        history = await store.get(session_id)      # pulls records newer than the cached ones
+        await store.append(session_id, user_msg)   # appends a record to the backend
+
+        async with store.turn_lock(session_id):    # one turn at a time, across workers
+            memory, version = await store.load_memory(session_id)
+            ...
+            await store.save_memory(session_id, memory, expected_version=version)
+    """
+
+    HISTORY_PREFIX = "history:"
+    MEMORY_PREFIX = "memory:"
+    LOCK_PREFIX = "turn:"
+
+    def __init__(
+        self,
+        backend: Optional[SessionBackend] = None,
+        max_sessions: Optional[int] = None,
+        idle_ttl: Optional[float] = None,
+        memory_budget: Optional[int] = None,
+        lock_ttl: Optional[float] = None,
+    ):
+        self.backend = backend or create_session_backend()
+        self.max_sessions = max_sessions or int(os.getenv("SESSION_CACHE_MAX_SESSIONS", "1000"))
+        self.idle_ttl = idle_ttl or float(os.getenv("SESSION_IDLE_TTL", "1800"))
+        self.memory_budget = memory_budget or int(os.getenv("SESSION_MEMORY_BUDGET_MB", "64")) * 1024 * 1024
+        self.lock_ttl = lock_ttl or float(os.getenv("SESSION_LOCK_TTL", "120"))
+
+        self._cache: "OrderedDict[str, _CachedSession]" = OrderedDict()
+        self._total_size = 0
+
+        logger.info(
+            f"Session store ready: max_sessions={self.max_sessions}, idle_ttl={self.idle_ttl}s, "
+            f"memory_budget={self.memory_budget // (1024 * 1024)}MB"
+        )
+
+    async def exists(self, session_id: str) -> bool:
+        """Whether a session has any history, on this worker or in the backend."""
+        if session_id in self._cache:
+            return True
+        items, _ = await asyncio.to_thread(self.backend.items_since, self.HISTORY_PREFIX + session_id, 0)
+        return bool(items)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    async def get(self, session_id: str) -> List[Msg]:
+        """
+        Return the history of a session (empty if it has none yet), including
+        messages appended by other workers since it was cached.
+        The returned list must be treated as read-only; use `append` to add messages.
+        """
+        self._evict_expired()
+
+        key = self.HISTORY_PREFIX + session_id
+        while True:
+            entry = self._cache.get(session_id)
+            cursor = entry.cursor if entry is not None else 0
+            items, latest = await asyncio.to_thread(self.backend.items_since, key, cursor)
+            # Another coroutine may have updated or evicted the entry meanwhile
+            current = self._cache.get(session_id)
+            if current is not entry or (entry is not None and entry.cursor != cursor):
+                continue
+            break
+
+        messages = self._decode_items(session_id, items)
+        if entry is None:
+            entry = _CachedSession(messages, latest)
+            self._cache[session_id] = entry
+            self._total_size += entry.size
+            if messages:
+                logger.debug(f"Restored session {session_id} ({len(messages)} messages) from backend")
+        else:
+            size = sum(_estimate_size(m) for m in messages)
+            entry.messages.extend(messages)
+            entry.size += size
+            entry.cursor = latest
+            self._total_size += size
+            self._cache.move_to_end(session_id)
+        self._enforce_limits(keep=session_id)
+
+        entry.last_access = time.monotonic()
+        return entry.messages
+
+    async def append(self, session_id: str, msg: Msg):
+        """Append a message to a session's history and persist it as a new record."""
+        data = json.dumps(_msg_to_dict(msg), ensure_ascii=False, default=str).encode("utf-8")
+        await asyncio.to_thread(self.backend.append_item, self.HISTORY_PREFIX + session_id, data)
+        # Pull the new record (and any appended by other workers) into the cache
+        await self.get(session_id)
+
+    async def delete(self, session_id: str):
+        """Drop a session (history and agent memory) from memory and the backend."""
+        if session_id in self._cache:
+            self._drop(session_id)
+        await asyncio.to_thread(self.backend.delete, self.HISTORY_PREFIX + session_id)
+        await asyncio.to_thread(self.backend.delete, self.MEMORY_PREFIX + session_id)
+
+    @asynccontextmanager
+    async def turn_lock(self, session_id: str) -> AsyncIterator[None]:
+        """Hold the turn lock of a session, shared by all workers, for one turn."""
+        key = self.LOCK_PREFIX + session_id
+        owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+        delay = 0.05
+        while not await asyncio.to_thread(self.backend.try_lock, key, owner, self.lock_ttl):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+        renewal = asyncio.create_task(self._renew_lock(key, owner))
+        try:
+            yield
+        finally:
+            renewal.cancel()
+            await asyncio.gather(renewal, return_exceptions=True)
+            await asyncio.to_thread(self.backend.unlock, key, owner)
+
+    async def _renew_lock(self, key: str, owner: str):
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                if not await asyncio.to_thread(self.backend.try_lock, key, owner, self.lock_ttl):
+                    logger.warning(f"Lost session lock {key}; another turn may run concurrently")
+            except Exception as e:
+                logger.warning(f"Failed to renew session lock {key}: {e}")
+
+    async def load_memory(self, session_id: str) -> Tuple[List[Msg], Optional[int]]:
+        """
+        Load the persisted agent memory (full ReAct transcript) of a session and
+        its version (0 if none was saved, None if it could not be read).
+        """
+        def load() -> Tuple[List[Msg], Optional[int]]:
+            record = self.backend.load(self.MEMORY_PREFIX + session_id)
+            if record is None:
+                return [], 0
+            try:
+                return [Msg.from_dict(d) for d in _decode(record[1])], record[0]
+            except Exception as e:
+                # An unreadable memory is replaced by the next save
+                logger.error(f"Discarding unreadable agent memory of session {session_id}: {e}")
+                return [], record[0]
+
+        try:
+            return await asyncio.to_thread(load)
+        except Exception as e:
+            logger.error(f"Failed to restore agent memory for session {session_id}: {e}")
+            return [], None
+
+    async def save_memory(self, session_id: str, msgs: List[Msg], expected_version: Optional[int] = None) -> bool:
+        """
+        Persist the agent memory of a session so any worker can resume it.
+        With `expected_version` (from `load_memory`), nothing is written and
+        False is returned if another turn saved the memory in the meantime.
+        """
+        records = [m.to_dict() for m in msgs]
+        version = await asyncio.to_thread(
+            self.backend.save, self.MEMORY_PREFIX + session_id, _encode(records), expected_version
+        )
+        return version is not None
+
+    def flush(self):
+        """Drop the in-memory cache; every write already reached the backend."""
+        self._cache.clear()
+        self._total_size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached_sessions": len(self._cache),
+            "cached_bytes": self._total_size,
+            "memory_budget": self.memory_budget,
+        }
+
+    def _evict_expired(self):
+        """Evict sessions idle for longer than idle_ttl (oldest first)."""
+        now = time.monotonic()
+        while self._cache:
+            session_id, entry = next(iter(self._cache.items()))
+            if now - entry.last_access < self.idle_ttl:
+                break
+            self._drop(session_id)
+
+    def _enforce_limits(self, keep: Optional[str] = None):
+        """Evict least recently used sessions until count and memory limits hold."""
+        while self._cache and (
+            len(self._cache) > self.max_sessions or self._total_size > self.memory_budget
+        ):
+            session_id = next(iter(self._cache))
+            if session_id == keep:
+                # The active session alone exceeds the budget; keep it cached
+                if len(self._cache) == 1:
+                    break
+                self._cache.move_to_end(session_id)
+                continue
+            self._drop(session_id)
+
+    def _drop(self, session_id: str):
+        entry = self._cache.pop(session_id)
+        self._total_size -= entry.size
+        logger.debug(f"Evicted session {session_id} ({len(entry.messages)} messages) from cache")
+
+    def _decode_items(self, session_id: str, items: List[bytes]) -> List[Msg]:
+        messages = []
+        for item in items:
+            try:
+                messages.append(_dict_to_msg(json.loads(item)))
+            except Exception as e:
+                logger.error(f"Skipping unreadable history record of session {session_id}: {e}")
+        return messages
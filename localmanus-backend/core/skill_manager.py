@@ -1,12 +1,19 @@
 import importlib
 import inspect
+import json
 import os
+import re
 import logging
 import asyncio
+import time
 from contextvars import ContextVar
 from typing import Dict, Any, List, Optional
 from agentscope.tool import Toolkit, ToolResponse
 from agentscope.message import ToolUseBlock, TextBlock
+from core.metrics import TOOL_CALL_SECONDS
+from core.tracing import tracer, payload_size
+from core.artifact_store import read_artifact
+from core.tool_cache import tool_cache
 
 logger = logging.getLogger("LocalManus-SkillManager")
 
@@ -14,6 +21,11 @@ logger = logging.getLogger("LocalManus-SkillManager")
 # This ensures thread-safety and isolation between concurrent requests
 _user_context_var: ContextVar[Optional[Dict]] = ContextVar('user_context', default=None)
 
+async def _iterate(items):
+    for item in items:
+        yield item
+
+
 class UserContextToolkit(Toolkit):
     """
     Custom Toolkit that injects user_context into tool function calls.
@@ -80,13 +92,57 @@ class UserContextToolkit(Toolkit):
         
         # AgentScope's _acting method expects a list, not an async generator
         # We need to collect all responses and return them as a list
-        gen = await super().call_tool_function(updated_block)
+        started = time.perf_counter()
+        status = "error"
+        with tracer.span("tool_call", tool=tool_name, input_chars=payload_size(tool_input)) as span:
+            try:
+                # Repeated deterministic calls are served from (or coalesced in) the result cache
+                responses, source = await tool_cache.run(
+                    tool_name,
+                    tool_input,
+                    (user_context or {}).get("id"),
+                    lambda: self._collect(updated_block),
+                    store_if=lambda r: not is_error_response(r),
+                )
+                status = "error" if is_error_response(responses) else "ok"
+                span.set(output_chars=payload_size(responses), tool_status=status, cache=source)
+                if source in ("hit", "coalesced") and status == "ok":
+                    status = "cached"
+                return responses
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            finally:
+                TOOL_CALL_SECONDS.observe(time.perf_counter() - started, tool=tool_name, status=status)
+
+    async def _collect(self, tool_block: ToolUseBlock) -> List[ToolResponse]:
+        gen = await super().call_tool_function(tool_block)
         responses = []
         async for response in gen:
             responses.append(response)
         return responses
 
 
+# e.g. "Search error: ...", "Scrape error: ..."
+_NAMED_ERROR = re.compile(r"^\w+ error:", re.IGNORECASE)
+
+
+def is_error_text(text: str) -> bool:
+    """Toolkit and skills report failures as text starting with "Error", "❌" or "<Something> error:"."""
+    text = text.lstrip()
+    return text.startswith(("Error", "❌")) or bool(_NAMED_ERROR.match(text))
+
+
+def is_error_response(responses: List[ToolResponse]) -> bool:
+    """Whether any text block of the tool responses reports a failure (see `is_error_text`)."""
+    for response in responses:
+        for block in getattr(response, "content", None) or []:
+            text = block.get("text") if isinstance(block, dict) else getattr(block, "text", None)
+            if isinstance(text, str) and is_error_text(text):
+                return True
+    return False
+
+
 class BaseSkill:
     """
     Base class for all skills. 
@@ -104,7 +160,14 @@ class SkillManager:
         # The skills_dir is relative to the backend root (main.py location)
         self.skills_dir = skills_dir
         self.toolkit = UserContextToolkit()  # Use custom toolkit with user context injection
+        # Derived tool metadata, rebuilt only when the toolkit changes
+        self._metadata_version = None
+        self._tool_schemas: List[Dict[str, Any]] = []
+        self._tools_metadata = ""
+        self._skills_prompt: Optional[str] = None
         self._load_skills()
+        # Built-in tools that belong to the agent runtime rather than a skill
+        self.toolkit.register_tool_function(read_artifact)
 
     def _load_skills(self):
         """
@@ -216,10 +279,12 @@ class SkillManager:
                 input=kwargs
             )
             
-            # Collect all responses from the async generator
-            # First await to get the generator, then iterate
+            # Collect all responses; UserContextToolkit returns a list, the
+            # base Toolkit an async generator
             responses = []
             gen = await self.toolkit.call_tool_function(tool_block)
+            if not hasattr(gen, "__aiter__"):
+                gen = _iterate(gen)
             async for response in gen:
                 if isinstance(response, ToolResponse):
                     responses.extend(response.content)
@@ -244,6 +309,10 @@ class SkillManager:
         _user_context_var.set(user_context)
         logger.debug(f"Set user context for task: {user_context}")
 
+    def get_user_context(self) -> Optional[Dict]:
+        """Return the user context of the current async task, if any."""
+        return _user_context_var.get()
+
     def clear_user_context(self):
         """Clear the user context for the current async task."""
         _user_context_var.set(None)
@@ -251,8 +320,45 @@ class SkillManager:
 
     def list_all_tools(self) -> List[Dict[str, Any]]:
         """Compatibility method for existing ReActAgent."""
-        return self.toolkit.get_json_schemas()
+        return self.get_tool_schemas()
 
     def get_skills_prompt(self) -> Optional[str]:
         """Returns the prompt for all registered agent skills."""
-        return self.toolkit.get_agent_skill_prompt()
+        self._refresh_metadata()
+        return self._skills_prompt
+
+    @property
+    def toolkit_version(self) -> tuple:
+        """
+        Cheap fingerprint of the toolkit contents: registered tools, agent skills
+        and active tool groups. Changes whenever any of them changes.
+        """
+        groups = getattr(self.toolkit, "groups", {}) or {}
+        return (
+            tuple(self.toolkit.tools),
+            tuple(getattr(self.toolkit, "skills", {}) or {}),
+            tuple(name for name, group in groups.items() if getattr(group, "active", True)),
+        )
+
+    def get_tool_schemas(self) -> List[Dict[str, Any]]:
+        """
+        Returns the JSON schemas of all active tools, cached per toolkit version.
+        The returned list is shared and must not be modified.
+        """
+        self._refresh_metadata()
+        return self._tool_schemas
+
+    def get_tools_metadata(self) -> str:
+        """Returns the tool schemas serialized for the system prompt, cached per toolkit version."""
+        self._refresh_metadata()
+        return self._tools_metadata
+
+    def _refresh_metadata(self):
+        version = self.toolkit_version
+        if version == self._metadata_version:
+            return
+        self._tool_schemas = self.toolkit.get_json_schemas()
+        self._tools_metadata = json.dumps(self._tool_schemas, indent=2, ensure_ascii=False)
+        self._skills_prompt = self.toolkit.get_agent_skill_prompt()
+        self._metadata_version = version
+        logger.debug(f"Rebuilt tool metadata for {len(self._tool_schemas)} tools")
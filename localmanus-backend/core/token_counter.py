@@ -0,0 +1,199 @@
+"""
+Token Counter for LocalManus
+
+Token counts for memory compression, the context window and rate limiting.
+
+- Uses a tiktoken encoding (TOKENIZER_ENCODING, default cl100k_base) when
+  tiktoken is installed and the encoding can be loaded. Loading may download
+  the encoding file, so `preload_encoding` runs it in a thread at startup
+- Otherwise falls back to a CJK-aware estimate: CJK characters count about
+  one token each, other text about four characters per token. A flat
+  characters/4 estimate undercounts Chinese text three to four times.
+- Message counts are cached by message id (TOKEN_CACHE_SIZE entries), so
+  repeated checks over a growing memory only count the new messages; an
+  entry is reused only while the message still holds the same content
+  object with the same length, so a lookup never re-reads the content
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+import logging
+from collections import OrderedDict
+from typing import Any, Optional
+from agentscope.message import Msg
+from agentscope.token import TokenCounterBase
+
+logger = logging.getLogger("LocalManus-TokenCounter")
+
+try:
+    import tiktoken
+except ImportError:  # optional: estimator fallback
+    tiktoken = None
+
+CHARS_PER_TOKEN = 4
+CJK_TOKENS_PER_CHAR = 1.0
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD = 4
+# Flat cost of non-text blocks (images, audio) whose size is unknown here
+MEDIA_BLOCK_TOKENS = 85
+
+# CJK ideographs, kana, hangul and full-width punctuation
+_CJK = re.compile(
+    "[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff"
+    "\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]"
+)
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None:
+            name = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+            try:
+                _encoding = tiktoken.get_encoding(name)
+            except Exception as e:
+                # e.g. the encoding file cannot be downloaded in an offline deployment
+                logger.warning(f"tiktoken encoding {name} unavailable, using estimates: {e}")
+    return _encoding
+
+
+async def preload_encoding() -> bool:
+    """Load the tiktoken encoding off the event loop; True if counts are exact."""
+    return await asyncio.to_thread(_get_encoding) is not None
+
+
+def _content_signature(content: Any) -> Optional[tuple]:
+    """
+    Identity and length of a message's content, to detect replaced content
+    without re-reading it. Content is replaced by assignment (e.g. artifact
+    previews, streamed chunks), which changes its identity; appended blocks
+    change its length.
+    """
+    if isinstance(content, (str, list)):
+        return id(content), len(content)
+    return None
+
+
+def estimate_text_tokens(text: str) -> int:
+    """CJK-aware token estimate of `text` without a tokenizer."""
+    if not text:
+        return 0
+    cjk = len(text) - len(_CJK.sub("", text))
+    return math.ceil(cjk * CJK_TOKENS_PER_CHAR + (len(text) - cjk) / CHARS_PER_TOKEN)
+
+
+def count_text_tokens(text: str) -> int:
+    """Token count of `text`: exact with tiktoken, estimated otherwise."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_text_tokens(text)
+
+
+def _block_get(block: Any, key: str, default: Any = None) -> Any:
+    if isinstance(block, dict):
+        return block.get(key, default)
+    return getattr(block, key, default)
+
+
+def _content_tokens(content: Any) -> int:
+    if content is None:
+        return 0
+    if isinstance(content, str):
+        return count_text_tokens(content)
+    if not isinstance(content, list):
+        return count_text_tokens(str(content))
+
+    total = 0
+    for block in content:
+        if isinstance(block, str):
+            total += count_text_tokens(block)
+            continue
+        block_type = _block_get(block, "type")
+        if block_type in ("text", None):
+            total += count_text_tokens(_block_get(block, "text", "") or "")
+        elif block_type == "thinking":
+            total += count_text_tokens(_block_get(block, "thinking", "") or "")
+        elif block_type == "tool_use":
+            arguments = _block_get(block, "input", {})
+            if not isinstance(arguments, str):
+                arguments = json.dumps(arguments, ensure_ascii=False, default=str)
+            total += count_text_tokens(_block_get(block, "name", "") or "") + count_text_tokens(arguments)
+        elif block_type == "tool_result":
+            total += _content_tokens(_block_get(block, "output", ""))
+        else:
+            total += MEDIA_BLOCK_TOKENS
+    return total
+
+
+class TokenCounter(TokenCounterBase):
+    """
+    Counts tokens of Msg objects, formatted message dicts or plain strings.
+
+    Usage:
+        counter = TokenCounter()
+        tokens = counter.count_message(msg)          # cached by msg.id
+        tokens = await counter.count(messages)       # TokenCounterBase interface
+    """
+
+    def __init__(self, cache_size: Optional[int] = None):
+        self.cache_size = cache_size or int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+        # msg id -> (content signature, tokens)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+    @property
+    def exact(self) -> bool:
+        """Whether counts come from a real tokenizer rather than the estimator."""
+        return _get_encoding() is not None
+
+    def count_message(self, msg: Msg) -> int:
+        """Tokens of one message, cached by its id."""
+        msg_id = getattr(msg, "id", None)
+        content = msg.content
+        # Guards against a message whose content was replaced after it was counted
+        signature = _content_signature(content)
+        if msg_id is not None and signature is not None:
+            cached = self._cache.get(msg_id)
+            if cached is not None and cached[0] == signature:
+                self._cache.move_to_end(msg_id)
+                return cached[1]
+
+        tokens = _content_tokens(content) + MESSAGE_OVERHEAD
+        if msg_id is not None and signature is not None:
+            self._cache[msg_id] = (signature, tokens)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def count_sync(self, messages: Any) -> int:
+        if isinstance(messages, str):
+            return count_text_tokens(messages)
+        if isinstance(messages, Msg):
+            return self.count_message(messages)
+        if isinstance(messages, dict):
+            # Formatted API message: content plus any tool calls
+            tokens = _content_tokens(messages.get("content")) + MESSAGE_OVERHEAD
+            for tool_call in messages.get("tool_calls") or []:
+                function = tool_call.get("function", {}) if isinstance(tool_call, dict) else {}
+                tokens += count_text_tokens(function.get("name", "") or "")
+                tokens += count_text_tokens(str(function.get("arguments", "") or ""))
+            return tokens
+        if isinstance(messages, (list, tuple)):
+            return sum(self.count_sync(m) for m in messages)
+        return count_text_tokens(str(messages))
+
+    async def count(self, messages: Any, **kwargs: Any) -> int:
+        return self.count_sync(messages)
+
+
+# Shared instance, so the per-message cache is reused across agents
+token_counter = TokenCounter()
@@ -0,0 +1,241 @@
+"""
+Tool Result Cache for LocalManus
+
+Reuses the results of deterministic tool calls, so that an agent repeating
+the same search, page scrape or file read within a session (or across
+users) does not reload a browser page or re-issue sandbox requests.
+
+- Each cacheable tool has a policy: TTL in seconds and scope. "global"
+  entries are shared by all users; "user" entries are keyed by user id
+- The key is the tool name plus its arguments; the injected user_id and
+  user_context only count for user-scoped tools, which are not cached at
+  all when the calling user is unknown
+- Calls to write tools (file writes, shell and code execution, project
+  generation, publishing, browser actions) drop the user's scoped entries,
+  before and after they run; a write by an unknown user drops the scoped
+  entries of every user. Uploads and deletions through the API call
+  `invalidate_user` directly
+- Identical concurrent calls are coalesced: one executes, the others wait
+  for its result
+- Failed calls are never cached
+- TOOL_CACHE_POLICIES (JSON) overrides or adds policies, e.g.
+  {"scrape_web": {"ttl": 0}} disables caching of scrape_web;
+  TOOL_CACHE_ENABLED=false turns the cache off
+"""
+
+import asyncio
+import json
+import os
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("LocalManus-ToolCache")
+
+SCOPE_GLOBAL = "global"
+SCOPE_USER = "user"
+
+# Injected by the toolkit, not chosen by the model
+_INJECTED_ARGS = ("user_id", "user_context")
+
+
+@dataclass(frozen=True)
+class ToolCachePolicy:
+    """How long results of a tool stay valid and who may reuse them."""
+    ttl: float
+    scope: str = SCOPE_USER
+
+
+DEFAULT_POLICIES: Dict[str, ToolCachePolicy] = {
+    # Web results: identical for every user, short-lived
+    "search_web": ToolCachePolicy(ttl=600, scope=SCOPE_GLOBAL),
+    "search": ToolCachePolicy(ttl=600, scope=SCOPE_GLOBAL),
+    "scrape_web": ToolCachePolicy(ttl=600, scope=SCOPE_GLOBAL),
+    "scrape": ToolCachePolicy(ttl=600, scope=SCOPE_GLOBAL),
+    # Static catalogues
+    "list_available_themes": ToolCachePolicy(ttl=3600, scope=SCOPE_GLOBAL),
+    "list_available_resolutions": ToolCachePolicy(ttl=3600, scope=SCOPE_GLOBAL),
+    # Sandbox reads: per user, invalidated by write tools
+    "file_read": ToolCachePolicy(ttl=120),
+    "read_file": ToolCachePolicy(ttl=120),
+    "view_file": ToolCachePolicy(ttl=120),
+    "read_user_file": ToolCachePolicy(ttl=120),
+    "directory_list": ToolCachePolicy(ttl=120),
+    "list_dir": ToolCachePolicy(ttl=120),
+    "list_files": ToolCachePolicy(ttl=120),
+    "list_user_files": ToolCachePolicy(ttl=120),
+}
+
+# Tools with side effects that may change what user-scoped tools return
+WRITE_TOOLS = frozenset({
+    "file_write", "write_file",
+    "shell_execute", "run_shell", "run_shell_command",
+    "python_execute", "run_python",
+    "create_fullstack_project", "start_dev_server",
+    "convert_markdown_to_html",
+    "upload_cover_image", "create_draft_article",
+    "generate_image", "generate_wechat_cover",
+    "generate_image_gemini", "generate_image_dalle",
+    "generate_product_diagram", "generate_product_cover",
+    "browser_screenshot", "browser_click", "browser_type", "browser_scroll",
+})
+
+
+def _load_policies() -> Dict[str, ToolCachePolicy]:
+    policies = dict(DEFAULT_POLICIES)
+    raw = os.getenv("TOOL_CACHE_POLICIES", "")
+    if not raw:
+        return policies
+    try:
+        for name, spec in json.loads(raw).items():
+            policies[name] = ToolCachePolicy(
+                ttl=float(spec.get("ttl", 0)), scope=spec.get("scope", SCOPE_USER)
+            )
+    except Exception as e:
+        logger.warning(f"Ignoring invalid TOOL_CACHE_POLICIES: {e}")
+    return policies
+
+
+def call_owner(tool_input: Dict[str, Any], user_id: Optional[str] = None) -> Optional[str]:
+    """The user a call runs for: the injected arguments first, then `user_id`."""
+    user_context = tool_input.get("user_context")
+    for candidate in (
+        tool_input.get("user_id"),
+        user_context.get("id") if isinstance(user_context, dict) else None,
+        user_id,
+    ):
+        if candidate not in (None, ""):
+            return str(candidate)
+    return None
+
+
+class _LeaderGone(Exception):
+    """The executing call was cancelled; a waiting call takes over."""
+
+
+class ToolResultCache:
+    """
+    TTL cache with request coalescing for tool results.
+
+    Usage:
+        responses, source = await tool_cache.run(
+            "search_web", {"query": "x"}, user_id, execute, store_if=lambda r: True
+        )
+        # source: "miss", "hit", "coalesced" or "bypass" (not cacheable)
+    """
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, ToolCachePolicy]] = None,
+        max_entries: Optional[int] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self.policies = policies if policies is not None else _load_policies()
+        self.max_entries = max_entries or int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1000"))
+        self.enabled = enabled if enabled is not None else os.getenv("TOOL_CACHE_ENABLED", "true").lower() == "true"
+        # key -> (expires at, owning user or None, responses)
+        self._entries: "OrderedDict[str, Tuple[float, Optional[str], List[Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Bumped by every write (per user, or for all users); results computed
+        # across a bump are not stored
+        self._generations: Dict[str, int] = {}
+        self._global_generation = 0
+
+    def key(self, tool_name: str, tool_input: Dict[str, Any], user_id: Optional[str]) -> Optional[str]:
+        """Cache key of a call, or None if the tool is not cacheable."""
+        policy = self.policies.get(tool_name)
+        if not self.enabled or policy is None or policy.ttl <= 0:
+            return None
+        owner = "*"
+        if policy.scope == SCOPE_USER:
+            owner = call_owner(tool_input, user_id)
+            if owner is None:
+                return None
+        args = {k: v for k, v in tool_input.items() if k not in _INJECTED_ARGS}
+        try:
+            encoded = json.dumps(args, sort_keys=True, ensure_ascii=False, default=str)
+        except Exception:
+            return None
+        return f"{tool_name}|{owner}|{encoded}"
+
+    async def run(
+        self,
+        tool_name: str,
+        tool_input: Dict[str, Any],
+        user_id: Optional[str],
+        execute: Callable[[], Awaitable[List[Any]]],
+        store_if: Callable[[List[Any]], bool] = lambda responses: True,
+    ) -> Tuple[List[Any], str]:
+        """Return the responses of a call and where they came from."""
+        user = call_owner(tool_input, user_id)
+        if tool_name in WRITE_TOOLS:
+            self.invalidate_user(user)
+            try:
+                return await execute(), "bypass"
+            finally:
+                self.invalidate_user(user)
+
+        key = self.key(tool_name, tool_input, user_id)
+        if key is None:
+            return await execute(), "bypass"
+
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return list(entry[2]), "hit"
+                del self._entries[key]
+
+            waiting = self._inflight.get(key)
+            if waiting is None:
+                break
+            try:
+                return list(await asyncio.shield(waiting)), "coalesced"
+            except _LeaderGone:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation(user)
+        try:
+            responses = await execute()
+        except BaseException as e:
+            future.set_exception(_LeaderGone() if isinstance(e, asyncio.CancelledError) else e)
+            # Marks the exception as retrieved when nobody is waiting
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        future.set_result(responses)
+        policy = self.policies[tool_name]
+        stale = policy.scope == SCOPE_USER and self._generation(user) != generation
+        if not stale and store_if(responses):
+            owner = user if policy.scope == SCOPE_USER else None
+            self._entries[key] = (time.monotonic() + policy.ttl, owner, list(responses))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return responses, "miss"
+
+    def _generation(self, user: Optional[str]) -> Tuple[int, int]:
+        return self._global_generation, self._generations.get(user, 0)
+
+    def invalidate_user(self, user_id: Optional[Any]):
+        """Drop all user-scoped entries of `user_id`, or of every user if it is None."""
+        if user_id is None:
+            self._global_generation += 1
+            stale = [k for k, (_, owner, _) in self._entries.items() if owner is not None]
+        else:
+            user_id = str(user_id)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            stale = [k for k, (_, owner, _) in self._entries.items() if owner == user_id]
+        for key in stale:
+            del self._entries[key]
+        if stale:
+            logger.debug(f"Invalidated {len(stale)} cached tool results of user {user_id or 'all users'}")
+
+
+tool_cache = ToolResultCache()
@@ -0,0 +1,256 @@
+"""
+Run Tracing for LocalManus
+
+Lightweight spans that show where a slow turn spent its time.
+
+- A trace starts at the top of a chat run or workflow (`start_trace`);
+  nested `span` calls (reasoning, formatter passes, tool calls, sandbox
+  HTTP requests) attach to the innermost open span of the current task
+- Each span records its duration, status and payload sizes
+- Finished spans are appended to a rotating JSONL file (TRACE_FILE,
+  TRACE_MAX_BYTES, TRACE_BACKUP_COUNT) by a background thread, so file
+  writes and rotation never run on the event loop; the most recent traces
+  (TRACE_RECENT_TRACES) are kept in memory for fast lookup
+- `get_trace` returns every span of a trace, falling back to the JSONL
+  files for traces no longer held in memory
+
+Spans outside of a trace are no-ops, so instrumented code can be called
+from anywhere. TRACING_ENABLED=false turns tracing off entirely.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+import queue
+import logging
+import logging.handlers
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger("LocalManus-Tracing")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def payload_size(value: Any) -> int:
+    """Approximate size in characters of a (nested) payload, without serializing it."""
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(payload_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(v) for v in value)
+    content = getattr(value, "content", None)
+    if content is not None and content is not value:
+        return payload_size(content)
+    return len(str(value))
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    def __init__(self, name: str, trace_id: str, parent: Optional["Span"] = None, user_id: Any = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.user_id = parent.user_id if parent is not None else user_id
+        self.attributes: Dict[str, Any] = {}
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms = 0.0
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "user_id": self.user_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NullSpan:
+    """Returned when no trace is active; accepts and drops attributes."""
+
+    trace_id = None
+
+    def set(self, **attributes: Any):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Creates spans and exports them to memory and a rotating JSONL file.
+
+    Usage:
+        with tracer.start_trace("chat_run", user_id=1, session_id="s1") as root:
+            with tracer.span("tool_call", tool="web_search") as span:
+                ...
+                span.set(output_chars=len(text))
+        spans = tracer.get_trace(root.trace_id)
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        backup_count: Optional[int] = None,
+        recent_traces: Optional[int] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self.path = Path(path or os.getenv("TRACE_FILE", "logs/traces.jsonl"))
+        self.max_bytes = max_bytes or int(os.getenv("TRACE_MAX_BYTES", str(10 * 1024 * 1024)))
+        self.backup_count = backup_count if backup_count is not None else int(os.getenv("TRACE_BACKUP_COUNT", "3"))
+        self.recent_traces = recent_traces or int(os.getenv("TRACE_RECENT_TRACES", "200"))
+        self.enabled = enabled if enabled is not None else os.getenv("TRACING_ENABLED", "true").lower() == "true"
+
+        self._recent: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._exporter: Optional[logging.Logger] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+
+    # ------------------------------------------------------------------
+    # Span API
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def start_trace(self, name: str, trace_id: Optional[str] = None, user_id: Any = None, **attributes: Any) -> Iterator[Any]:
+        """Open the root span of a new trace (or of `trace_id`, if given)."""
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+        span = Span(name, trace_id or uuid.uuid4().hex, user_id=user_id)
+        with self._activate(span, attributes):
+            yield span
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        """Open a child of the current span; a no-op outside of a trace."""
+        parent = _current_span.get()
+        if parent is None or not self.enabled:
+            yield _NULL_SPAN
+            return
+        span = Span(name, parent.trace_id, parent=parent)
+        with self._activate(span, attributes):
+            yield span
+
+    def annotate(self, **attributes: Any):
+        """Add attributes to the current span, if any."""
+        span = _current_span.get()
+        if span is not None:
+            span.set(**attributes)
+
+    def current_trace_id(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.trace_id if span is not None else None
+
+    @contextmanager
+    def _activate(self, span: Span, attributes: Dict[str, Any]) -> Iterator[None]:
+        span.set(**attributes)
+        token = _current_span.set(span)
+        try:
+            yield
+        except BaseException as e:
+            span.status = "cancelled" if isinstance(e, (asyncio.CancelledError, GeneratorExit)) else "error"
+            span.error = str(e) or type(e).__name__
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - span._started) * 1000
+            _current_span.reset(token)
+            self._export(span)
+
+    # ------------------------------------------------------------------
+    # Export and lookup
+    # ------------------------------------------------------------------
+
+    def _export(self, span: Span):
+        record = span.to_dict()
+        spans = self._recent.get(span.trace_id)
+        if spans is None:
+            spans = self._recent[span.trace_id] = []
+            while len(self._recent) > self.recent_traces:
+                self._recent.popitem(last=False)
+        spans.append(record)
+        try:
+            self._get_exporter().info(json.dumps(record, ensure_ascii=False, default=str))
+        except Exception as e:
+            logger.warning(f"Failed to export span {span.name}: {e}")
+
+    def _get_exporter(self) -> logging.Logger:
+        if self._exporter is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            # The logger only enqueues; the listener thread writes and rotates the file
+            records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+            self._listener = logging.handlers.QueueListener(records, handler)
+            self._listener.start()
+            exporter = logging.getLogger("LocalManus-TraceExport")
+            exporter.setLevel(logging.INFO)
+            exporter.propagate = False
+            exporter.addHandler(logging.handlers.QueueHandler(records))
+            self._exporter = exporter
+        return self._exporter
+
+    def close(self):
+        """Write out queued spans and stop the export thread (on shutdown)."""
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+        if self._exporter is not None:
+            for handler in list(self._exporter.handlers):
+                self._exporter.removeHandler(handler)
+            self._exporter = None
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """All exported spans of a trace, ordered by start time. Blocking when reading files."""
+        spans = self._recent.get(trace_id)
+        if spans is None:
+            spans = self._read_from_files(trace_id)
+        return sorted(spans, key=lambda s: s["start_time"])
+
+    def _read_from_files(self, trace_id: str) -> List[Dict[str, Any]]:
+        files = [self.path] + [Path(f"{self.path}.{i}") for i in range(1, self.backup_count + 1)]
+        spans = []
+        for file in files:
+            if not file.exists():
+                continue
+            with open(file, encoding="utf-8") as f:
+                for line in f:
+                    # Cheap substring check before parsing
+                    if trace_id not in line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get("trace_id") == trace_id:
+                        spans.append(record)
+        return spans
+
+
+tracer = Tracer()
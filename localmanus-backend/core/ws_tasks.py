@@ -0,0 +1,92 @@
+"""
+WebSocket Task Multiplexer for LocalManus
+
+Runs the concurrent tasks of one /ws/task connection. Each task streams the
+events of a chat run or workflow to the shared socket, tagged with its task id.
+
+- Deltas are merged per task with SSEWriter.coalesce, as on the SSE endpoints
+- A task ends with exactly one of {"done": true}, {"cancelled": true} (the
+  client cancelled it) or {"error": ...}
+- Cancelling a task closes its event stream before the task finishes, so the
+  run's cleanup (agent release, history sync) has completed by then
+- At most `max_tasks` tasks run at once per connection
+"""
+
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set, Tuple, Type
+from core.sse_writer import SSEWriter
+
+logger = logging.getLogger("LocalManus-WSTasks")
+
+
+class TaskMultiplexer:
+    """
+    Concurrent event-streaming tasks sharing one connection.
+
+    Usage:
+        mux = TaskMultiplexer(send, max_tasks=8, disconnect_errors=(WebSocketDisconnect,))
+        error = mux.start(task_id, lambda: orchestrator.chat_events(...))
+        mux.cancel(task_id)
+        await mux.close()      # on disconnect
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, Dict[str, Any]], Awaitable[None]],
+        max_tasks: int,
+        disconnect_errors: Tuple[Type[BaseException], ...] = (),
+    ):
+        self._send = send
+        self.max_tasks = max_tasks
+        self._disconnect_errors = disconnect_errors
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._cancelled_by_client: Set[str] = set()
+
+    def start(self, task_id: str, make_events: Callable[[], AsyncIterator[Dict[str, Any]]]) -> Optional[str]:
+        """Start streaming the events of `make_events()`; returns an error message if refused."""
+        if task_id in self.tasks:
+            return "Task id already in use"
+        if len(self.tasks) >= self.max_tasks:
+            return f"At most {self.max_tasks} concurrent tasks per connection"
+        self.tasks[task_id] = asyncio.create_task(self._run(task_id, make_events))
+        return None
+
+    def cancel(self, task_id: str) -> bool:
+        """Cancel a task at the client's request; it ends with {"cancelled": true}."""
+        task = self.tasks.get(task_id)
+        if task is None:
+            return False
+        # Cancellation propagates into the agent and its running tools
+        self._cancelled_by_client.add(task_id)
+        task.cancel()
+        return True
+
+    async def close(self):
+        """Cancel all tasks (the connection is gone) and wait for their cleanup."""
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, task_id: str, make_events: Callable[[], AsyncIterator[Dict[str, Any]]]):
+        try:
+            events = make_events()
+            # aclosing() stops the run as soon as the task is cancelled, not at GC
+            async with aclosing(events), aclosing(SSEWriter().coalesce(events)) as stream:
+                async for event in stream:
+                    await self._send(task_id, event)
+            await self._send(task_id, {"done": True})
+        except asyncio.CancelledError:
+            if task_id in self._cancelled_by_client:
+                await self._send(task_id, {"cancelled": True})
+            raise
+        except self._disconnect_errors:
+            pass
+        except Exception as e:
+            logger.error(f"WebSocket task {task_id} failed: {e}", exc_info=True)
+            await self._send(task_id, {"error": str(e)})
+        finally:
+            self.tasks.pop(task_id, None)
+            self._cancelled_by_client.discard(task_id)
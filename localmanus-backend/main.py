@@ -1,15 +1,24 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Body, Request, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Body, Request, Depends, HTTPException, status, UploadFile, File, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, FileResponse, Response
 from fastapi.security import OAuth2PasswordRequestForm
-from core.orchestrator import Orchestrator
-from core.database import create_db_and_tables, get_session
+from core.orchestrator import Orchestrator, ReActRunFailed
+from core.run_registry import RunRegistry
+from core.sse_writer import SSEWriter, encode_event, DONE_FRAME
+from core.ws_tasks import TaskMultiplexer
+from core.jobs import JobQueue, JobQueueFull, JobFailed, to_read as job_to_read
+from core import metrics
+from core.tracing import tracer
+from core.tool_cache import tool_cache
+from core.token_counter import preload_encoding
+from core.database import create_db_and_tables, get_session, engine
 from core.models import (
     User, UserCreate, UserRead, Token, 
     UploadedFile, FileRead,
-    Project, ProjectCreate, ProjectUpdate, ProjectRead
+    Project, ProjectCreate, ProjectUpdate, ProjectRead,
+    JobRead
 )
-from core.auth import authenticate_user, create_access_token, get_password_hash, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
+from core.auth import authenticate_user, create_access_token, get_password_hash, get_current_user, get_user_from_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from core.skill_registry import SkillRegistry
 from core.agent_manager import agent_lifecycle, init_agents
 from core.config_manager import ConfigManager
@@ -21,6 +30,7 @@ import asyncio
 import os
 import shutil
 from datetime import timedelta, datetime
+from functools import partial
 from dotenv import load_dotenv
 from typing import Optional, List, Dict, Any
 from pathlib import Path
@@ -32,12 +42,20 @@ logger = logging.getLogger("LocalManus-Backend")
 load_dotenv()
 app = FastAPI(title="LocalManus API Gateway")
 orchestrator = Orchestrator()
+run_registry = RunRegistry()
+job_queue = JobQueue()
 # Initialize agents to get skill_manager
 manager, planner, react_agent = init_agents()
 from core.agent_manager import agent_lifecycle
 skill_registry = SkillRegistry(agent_lifecycle.skill_manager)
 config_manager = ConfigManager()
 
+# Gauges read live state at scrape time
+metrics.LLM_ACTIVE_CALLS.set_function(lambda: agent_lifecycle.llm_scheduler.stats()["active"])
+metrics.LLM_QUEUED_CALLS.set_function(lambda: agent_lifecycle.llm_scheduler.stats()["queued"])
+metrics.AGENT_POOL_ACTIVE.set_function(lambda: agent_lifecycle.agent_pool.stats()["active"])
+metrics.AGENT_POOL_IDLE.set_function(lambda: agent_lifecycle.agent_pool.stats()["idle"])
+
 # File upload configuration
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
@@ -57,9 +75,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _job_user_context(user_id: int) -> Dict[str, Any]:
+    """Rebuild the user context of a background job from its owner."""
+    with Session(engine) as session:
+        user = session.get(User, user_id)
+    if user is None:
+        return {"id": user_id}
+    return {"id": user.id, "username": user.username, "full_name": user.full_name}
+
+async def run_task_job(job, emit):
+    async def report(event):
+        node = event.get("node_status")
+        if node:
+            emit(f"[{node['status']}] step {node['step_id']} ({node['skill']})\n")
+    result = await orchestrator.run_workflow(job.input, user_context=_job_user_context(job.user_id), on_event=report)
+    if result.get("status") == "failed":
+        # Keep the plan and step results on the failed job
+        raise JobFailed(result.get("error") or "One or more workflow steps failed", result=result)
+    return result
+
+async def run_react_job(job, emit):
+    try:
+        return await orchestrator.run_react_loop(job.input, user_context=_job_user_context(job.user_id), on_output=emit)
+    except ReActRunFailed as e:
+        # Keep the partial answer (ending in the error message) on the failed job
+        raise JobFailed(str(e), result=e.output)
+
+job_queue.register("task", run_task_job)
+job_queue.register("react", run_react_job)
+
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     create_db_and_tables()
+    # Loads (and possibly downloads) the tokenizer before the first request needs it
+    await preload_encoding()
+    # Re-queues jobs interrupted by a previous shutdown or crash
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Running jobs are handed back to the queue and resumed on the next start
+    await job_queue.stop()
+    # Histories are written through to the session backend; just release the cache
+    orchestrator.sessions.flush()
+    # Writes out spans still queued for the trace file
+    tracer.close()
 
 @app.get("/api/health")
 async def health_check():
@@ -143,6 +203,8 @@ async def upload_file(
         session.add(db_file)
         session.commit()
         session.refresh(db_file)
+        # Cached file listings/reads of this user no longer reflect the uploads
+        tool_cache.invalidate_user(current_user.id)
         
         return db_file
     except Exception as e:
@@ -210,9 +272,15 @@ async def delete_file(
     # Delete database record
     session.delete(db_file)
     session.commit()
+    tool_cache.invalidate_user(current_user.id)
     
     return {"message": "File deleted successfully"}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition of this process's metrics"""
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     return {"status": "LocalManus API is running", "version": "0.1.0"}
@@ -388,19 +456,58 @@ async def delete_project(
     session.commit()
     return {"message": "Project deleted successfully"}
 
+async def _observed_run(frames):
+    """Track a chat run in the active-runs gauge and its duration histogram."""
+    metrics.ACTIVE_RUNS.inc()
+    try:
+        with metrics.CHAT_RUN_SECONDS.time():
+            async for frame in frames:
+                yield frame
+    finally:
+        metrics.ACTIVE_RUNS.dec()
+
 @app.get("/api/chat")
 async def chat_sse(
+    request: Request,
     input: str, 
     session_id: str = "default", 
     file_paths: Optional[str] = None,
     access_token: Optional[str] = None, 
+    last_event_id: Optional[str] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
     current_user: User = Depends(get_current_user)
 ):
     """
     SSE endpoint for multi-round chat with user context and file paths.
     file_paths can be passed as comma-separated string.
     access_token can be passed as query param for SSE support.
+
+    Every event carries an id. A reconnect sending the `Last-Event-ID` header
+    (or `last_event_id` query param) re-attaches to the still-running run and
+    only receives the events it missed. If every client disconnects and none
+    re-attaches within SSE_DISCONNECT_GRACE seconds, the run is cancelled.
     """
+    sse_headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",  # Disable nginx buffering
+    }
+
+    resume_id = last_event_id_header or last_event_id
+    if resume_id:
+        run, last_seq = run_registry.resume(current_user.id, resume_id)
+        if run is None:
+            # The run finished and expired; 204 tells EventSource to stop reconnecting
+            metrics.CHAT_REQUESTS.inc(kind="expired")
+            return Response(status_code=204)
+        metrics.CHAT_REQUESTS.inc(kind="resumed")
+        logger.info(f"Resuming run {run.run_id} after event {last_seq}")
+        return StreamingResponse(
+            run_registry.stream(run, last_seq, is_disconnected=request.is_disconnected),
+            media_type="text/event-stream",
+            headers=sse_headers,
+        )
+
     # Pass user info and file paths to orchestrator
     user_context = {
         "id": current_user.id,
@@ -413,67 +520,197 @@ async def chat_sse(
     if file_paths:
         file_paths_list = [p.strip() for p in file_paths.split(',') if p.strip()]
     
+    # The run executes independently of this connection so it can be resumed
+    metrics.CHAT_REQUESTS.inc(kind="new")
+    run = run_registry.start(
+        owner=current_user.id,
+        frames=_observed_run(
+            orchestrator.chat_stream(session_id, input, user_context=user_context, file_paths=file_paths_list)
+        ),
+    )
     return StreamingResponse(
-        orchestrator.chat_stream(session_id, input, user_context=user_context, file_paths=file_paths_list),
+        run_registry.stream(run, is_disconnected=request.is_disconnected),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",  # Disable nginx buffering
-        }
+        headers=sse_headers,
     )
 
-@app.post("/api/task")
+@app.get("/api/workflow")
+async def workflow_sse(
+    request: Request,
+    input: str,
+    access_token: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    SSE endpoint that plans a workflow DAG and executes it, streaming the plan,
+    node status changes and the final result. Independent steps run in parallel.
+    """
+    user_context = {
+        "id": current_user.id,
+        "username": current_user.username,
+        "full_name": current_user.full_name
+    }
+
+    async def frames():
+        async for frame in SSEWriter().stream(orchestrator.workflow_events(input, user_context=user_context)):
+            yield frame
+        yield DONE_FRAME
+
+    run = run_registry.start(owner=current_user.id, frames=frames())
+    return StreamingResponse(
+        run_registry.stream(run, is_disconnected=request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _submit_job(kind: str, payload: dict, current_user: User) -> Dict[str, Any]:
+    try:
+        job = job_queue.submit(current_user.id, kind, payload.get("input", ""))
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many queued jobs, please retry later",
+        )
+    return {"job_id": job.id, "status": job.status}
+
+def _get_user_job(job_id: str, current_user: User):
+    job = job_queue.get(job_id)
+    if not job or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/api/task", status_code=status.HTTP_202_ACCEPTED)
 async def create_task(payload: dict = Body(...), current_user: User = Depends(get_current_user)):
     """
-    Synchronous endpoint for task planning (demo).
+    Queue a workflow job (plan + DAG execution). Returns a job id; the plan
+    with per-step results is the job result.
     """
-    user_input = payload.get("input", "")
-    plan = await orchestrator.run_workflow(user_input)
-    return plan
+    return _submit_job("task", payload, current_user)
 
-@app.post("/api/react")
+@app.post("/api/react", status_code=status.HTTP_202_ACCEPTED)
 async def react_task(payload: dict = Body(...), current_user: User = Depends(get_current_user)):
     """
-    Synchronous endpoint for ReAct loop execution.
+    Queue a ReAct loop job. Returns a job id; the final answer is the job result.
+    """
+    return _submit_job("react", payload, current_user)
+
+@app.get("/api/jobs/{job_id}", response_model=JobRead)
+async def get_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Poll a job for its status, partial output and result.
+    """
+    return job_to_read(_get_user_job(job_id, current_user))
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str, access_token: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """
+    SSE stream of a job: status changes, output deltas and the final result.
+    access_token can be passed as query param for SSE support.
     """
-    user_input = payload.get("input", "")
-    result = await orchestrator.run_react_loop(user_input)
-    return {"result": result}
+    _get_user_job(job_id, current_user)
+
+    async def event_stream():
+        async for event in job_queue.events(job_id):
+            yield encode_event(event)
+        yield DONE_FRAME
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/traces/{trace_id}")
+async def get_trace(trace_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Spans of one of the user's chat runs, jobs or workflows, ordered by start time.
+    Chat streams announce their trace id in a {"trace_id"} event; workflow plans carry it as `trace_id`.
+    """
+    # Older traces are read from the rotated JSONL files
+    spans = await asyncio.to_thread(tracer.get_trace, trace_id)
+    spans = [s for s in spans if s.get("user_id") == current_user.id]
+    if not spans:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    root = next((s for s in spans if s["parent_id"] is None), None)
+    return {
+        "trace_id": trace_id,
+        "duration_ms": root["duration_ms"] if root else None,
+        "complete": root is not None,
+        "spans": spans,
+    }
+
+WS_MAX_TASKS = int(os.getenv("WS_MAX_TASKS", "8"))
 
 @app.websocket("/ws/task/{trace_id}")
-async def websocket_task_stream(websocket: WebSocket, trace_id: str):
+async def websocket_task_stream(websocket: WebSocket, trace_id: str, access_token: Optional[str] = None):
+    """
+    Multiplexed task channel: several concurrent tasks share one socket.
+
+    Client messages:
+        {"action": "chat" | "react", "task_id": str, "input": str, "session_id"?: str, "file_paths"?: [str]}
+        {"action": "start", "task_id": str, "input": str}      # plan and execute a workflow DAG
+        {"action": "cancel", "task_id": str}
+
+    Chat tasks without a session_id run in their own session "<trace_id>:<task_id>".
+
+    Server messages carry the task id plus one event of the same kinds as /api/chat
+    ({"content"}, {"thinking"}, {"tool_status"}, {"queue_status"}); workflows stream
+    {"plan"}, {"node_status"} and {"result"}. Each task ends with {"done": true}, {"cancelled": true} or {"error"}.
+    Compression uses permessage-deflate when the client offers it.
+    """
+    with Session(engine) as session:
+        user = get_user_from_token(session, access_token)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
     await websocket.accept()
     logger.info(f"WebSocket connected for trace_id: {trace_id}")
+    user_context = {"id": user.id, "username": user.username, "full_name": user.full_name}
+    send_lock = asyncio.Lock()
+
+    async def send(task_id: str, payload: Dict[str, Any]):
+        message = {"task_id": task_id, **payload}
+        async with send_lock:
+            await websocket.send_text(json.dumps(message, ensure_ascii=False, default=str))
+
+    def task_events(task_id: str, client_msg: Dict[str, Any]):
+        user_input = client_msg.get("input", "")
+        if client_msg.get("action") == "start":
+            return orchestrator.workflow_events(user_input, user_context=user_context)
+        # Each task gets its own session unless the client names one, so
+        # concurrent tasks on this socket neither serialize nor mix histories
+        return orchestrator.chat_events(
+            client_msg.get("session_id") or f"{trace_id}:{task_id}",
+            user_input,
+            user_context=user_context,
+            file_paths=client_msg.get("file_paths"),
+        )
+
+    mux = TaskMultiplexer(send, WS_MAX_TASKS, disconnect_errors=(WebSocketDisconnect,))
     try:
         while True:
             data = await websocket.receive_text()
-            client_msg = json.loads(data)
-            
-            if client_msg.get("action") == "start":
-                # ... existing logic ...
-                pass
-            
-            elif client_msg.get("action") == "react":
-                user_input = client_msg.get("input", "")
-                
-                # Mocking the ReAct loop progress for UI
-                await websocket.send_text(json.dumps({
-                    "type": "thought",
-                    "content": "I should check the available tools for this request.",
-                    "agent": "ReActAgent"
-                }, ensure_ascii=False))
-                
-                result = await orchestrator.run_react_loop(user_input)
-                
-                await websocket.send_text(json.dumps({
-                    "type": "result",
-                    "content": result,
-                    "trace_id": trace_id
-                }, ensure_ascii=False))
-                
+            try:
+                client_msg = json.loads(data)
+            except ValueError:
+                continue
+            action = client_msg.get("action")
+            task_id = str(client_msg.get("task_id") or uuid.uuid4().hex)
+
+            if action == "cancel":
+                mux.cancel(task_id)
+            elif action in ("chat", "react", "start"):
+                error = mux.start(task_id, partial(task_events, task_id, client_msg))
+                if error:
+                    await send(task_id, {"error": error})
+            else:
+                await send(task_id, {"error": f"Unknown action: {action}"})
+
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for trace_id: {trace_id}")
+    finally:
+        await mux.close()
 
 from core.firecracker_sandbox import sandbox_manager
 
@@ -520,4 +757,13 @@ async def get_sandbox_info(current_user: User = Depends(get_current_user)):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Session state and turn locks live in the shared session backend, so several workers
+    # can serve the API; stream resume (Last-Event-ID) needs sticky routing by session
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("UVICORN_WORKERS", "1")),
+        # Compress WebSocket task streams when the client supports it
+        ws_per_message_deflate=os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() == "true",
+    )
@@ -0,0 +1,88 @@
+"""
+Regression tests for RunEventChannel backpressure and cancellation.
+
+A producer cancelled while the channel is full must not hang in cleanup code
+that emits events (e.g. the agent's run metadata), since a hung run keeps the
+session's agent pool lock.
+
+Usage:
+    python scripts/test_run_events.py
+    (or: python -m pytest scripts/test_run_events.py)
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.run_events import RunEventChannel, bind_run_channel, emit_event
+
+
+def _producer(channel: RunEventChannel, started: asyncio.Event):
+    async def produce():
+        bind_run_channel(channel)
+        try:
+            for i in range(10):
+                await emit_event({"tool_status": {"id": str(i), "status": "running"}})
+                if i == 1:
+                    started.set()
+        finally:
+            # Cleanup that emits, like run_stream's {"_meta"} event
+            await emit_event({"_meta": {"cancelled": True}})
+    return produce
+
+
+async def _cancel_blocked_producer(close_first: bool) -> bool:
+    channel = RunEventChannel(max_events=2)
+    started = asyncio.Event()
+    task = asyncio.create_task(_producer(channel, started)())
+    await started.wait()
+    await asyncio.sleep(0.01)  # producer is now waiting on the full channel
+
+    if close_first:
+        channel.close()
+    task.cancel()
+    try:
+        await asyncio.wait_for(task, timeout=2)
+    except asyncio.CancelledError:
+        pass
+    except asyncio.TimeoutError:
+        return False
+    return task.done()
+
+
+def test_cancelled_producer_does_not_block_on_full_channel():
+    assert asyncio.run(_cancel_blocked_producer(close_first=False))
+
+
+def test_close_then_cancel_releases_producer():
+    assert asyncio.run(_cancel_blocked_producer(close_first=True))
+
+
+def test_events_still_delivered_in_order():
+    async def run():
+        channel = RunEventChannel(max_events=2)
+
+        async def produce():
+            bind_run_channel(channel)
+            try:
+                for i in range(5):
+                    await emit_event({"tool_status": {"id": str(i)}})
+            finally:
+                channel.close()
+
+        task = asyncio.create_task(produce())
+        received = [event["tool_status"]["id"] async for event in channel]
+        await task
+        return received
+
+    assert asyncio.run(run()) == ["0", "1", "2", "3", "4"]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
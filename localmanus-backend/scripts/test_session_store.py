@@ -0,0 +1,92 @@
+"""
+Tests for the shared session store across workers.
+
+Two SessionStore instances on one SQLite file stand in for two uvicorn
+workers: turns of one session must not overlap, and no turn's agent memory
+may be lost.
+
+Usage:
+    python scripts/test_session_store.py
+    (or: python -m pytest scripts/test_session_store.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+# Add the project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agentscope.message import Msg
+from core.session_store import SessionStore, SQLiteSessionBackend
+
+
+def _workers(path: str, lock_ttl: float = 0.3):
+    return [SessionStore(SQLiteSessionBackend(path), lock_ttl=lock_ttl) for _ in range(2)]
+
+
+def test_turns_are_serialized_across_workers():
+    async def run(path):
+        workers = _workers(path)
+        timeline = []
+
+        async def turn(store, name):
+            async with store.turn_lock("s"):
+                memory, version = await store.load_memory("s")
+                timeline.append(name)
+                # Longer than the lock TTL: the lock must be renewed meanwhile
+                await asyncio.sleep(0.5)
+                timeline.append(name)
+                assert await store.save_memory("s", memory + [Msg(name, name, "user")], expected_version=version)
+
+        await asyncio.gather(turn(workers[0], "A"), turn(workers[1], "B"))
+        memory, _ = await workers[0].load_memory("s")
+        return timeline, [m.content for m in memory]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        timeline, contents = asyncio.run(run(os.path.join(tmp, "sessions.db")))
+    assert timeline in (["A", "A", "B", "B"], ["B", "B", "A", "A"])
+    assert sorted(contents) == ["A", "B"]
+
+
+def test_stale_memory_save_is_rejected():
+    async def run(path):
+        first, second = _workers(path)
+        _, version = await first.load_memory("s")
+        assert await second.save_memory("s", [Msg("B", "B", "user")], expected_version=version)
+        return await first.save_memory("s", [Msg("A", "A", "user")], expected_version=version)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        assert asyncio.run(run(os.path.join(tmp, "sessions.db"))) is False
+
+
+def test_lock_of_dead_worker_expires():
+    async def run(path):
+        first, second = _workers(path, lock_ttl=0.2)
+        assert second.backend.try_lock("turn:s", "dead-worker", 0.2)
+        async with first.turn_lock("s"):
+            return True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        assert asyncio.run(asyncio.wait_for(run(os.path.join(tmp, "sessions.db")), timeout=5))
+
+
+def test_history_appended_by_another_worker_is_visible():
+    async def run(path):
+        first, second = _workers(path)
+        assert not await second.exists("s")
+        await first.get("s")
+        await second.append("s", Msg("User", "hi", "user"))
+        return await second.exists("s"), [m.content for m in await first.get("s")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exists, contents = asyncio.run(run(os.path.join(tmp, "sessions.db")))
+    assert exists and contents == ["hi"]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
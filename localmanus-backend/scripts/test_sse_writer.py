@@ -0,0 +1,92 @@
+"""
+Regression tests for SSEWriter coalescing and cancellation.
+
+Cancelling a consumer of `coalesce` while deltas stream must unwind the
+source generator, so that the caller's aclose() of that generator succeeds
+and the run's cleanup code is awaited.
+
+Usage:
+    python scripts/test_sse_writer.py
+    (or: python -m pytest scripts/test_sse_writer.py)
+"""
+
+import asyncio
+import os
+import sys
+from contextlib import aclosing
+
+# Add the project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.sse_writer import SSEWriter
+
+
+async def _deltas(cleaned_up: list):
+    """Streams content deltas like chat_events, with cleanup that awaits."""
+    try:
+        for i in range(1000):
+            yield {"content": f"chunk {i} "}
+            # Waiting for the model most of the time
+            await asyncio.sleep(0.004)
+    finally:
+        await asyncio.sleep(0.001)
+        cleaned_up.append(True)
+
+
+async def _cancel_while_streaming(delay: float) -> tuple:
+    cleaned_up = []
+    events = _deltas(cleaned_up)
+    received = []
+
+    async def consume():
+        # Same shape as the WebSocket task runner in main.py
+        async with aclosing(events), aclosing(SSEWriter(flush_interval=0.005).coalesce(events)) as stream:
+            async for event in stream:
+                received.append(event)
+
+    task = asyncio.create_task(consume())
+    await asyncio.sleep(delay)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+    except Exception as e:
+        outcome = f"{type(e).__name__}: {e}"
+    else:
+        outcome = "finished"
+    assert received, "nothing was streamed before the cancel"
+    return outcome, bool(cleaned_up)
+
+
+def test_cancel_while_streaming_unwinds_source():
+    async def run():
+        return [await _cancel_while_streaming(0.01 + i * 0.003) for i in range(20)]
+
+    outcomes = asyncio.run(run())
+    # Before the fix most runs ended in "aclose(): asynchronous generator is already running"
+    assert outcomes == [("cancelled", True)] * 20, outcomes
+
+
+def test_deltas_are_merged():
+    async def run():
+        cleaned_up = []
+        events = _deltas(cleaned_up)
+
+        async def first_ten():
+            for _ in range(10):
+                yield await events.__anext__()
+
+        merged = [e async for e in SSEWriter(flush_interval=1).coalesce(first_ten())]
+        await events.aclose()
+        return merged
+
+    merged = asyncio.run(run())
+    assert merged == [{"content": "".join(f"chunk {i} " for i in range(10))}]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")
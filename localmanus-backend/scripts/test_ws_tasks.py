@@ -0,0 +1,144 @@
+"""
+Tests for the multiplexed WebSocket task channel (/ws/task).
+
+A task cancelled by the client while it streams must end with
+{"cancelled": true} (never {"error"}), and its run's cleanup must have
+finished by the time the task does.
+
+Usage:
+    python scripts/test_ws_tasks.py
+    (or: python -m pytest scripts/test_ws_tasks.py)
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.run_events import RunEventChannel, bind_run_channel, emit_event
+from core.ws_tasks import TaskMultiplexer
+
+
+class FakeRun:
+    """Event stream shaped like Orchestrator.chat_events: an agent task feeding a channel."""
+
+    def __init__(self, deltas: int = 1000, delay: float = 0.004):
+        self.deltas = deltas
+        self.delay = delay
+        self.cleaned_up = False
+
+    async def events(self):
+        channel = RunEventChannel()
+
+        async def pump_agent():
+            bind_run_channel(channel)
+            try:
+                for i in range(self.deltas):
+                    await emit_event({"content": f"chunk {i} "})
+                    await asyncio.sleep(self.delay)
+            finally:
+                channel.close()
+
+        agent_task = asyncio.create_task(pump_agent())
+        try:
+            yield {"trace_id": "t"}
+            async for event in channel:
+                yield event
+        finally:
+            channel.close()
+            agent_task.cancel()
+            await asyncio.gather(agent_task, return_exceptions=True)
+            # e.g. releasing the pooled agent and syncing history
+            await asyncio.sleep(0.001)
+            self.cleaned_up = True
+
+
+def _recorder():
+    sent = []
+
+    async def send(task_id, payload):
+        sent.append((task_id, payload))
+
+    return sent, send
+
+
+async def _cancel_while_streaming(delay: float):
+    sent, send = _recorder()
+    mux = TaskMultiplexer(send, max_tasks=8)
+    run = FakeRun()
+    assert mux.start("a", run.events) is None
+    task = mux.tasks["a"]
+
+    await asyncio.sleep(delay)
+    assert mux.cancel("a")
+    await asyncio.gather(task, return_exceptions=True)
+
+    payloads = [payload for _, payload in sent]
+    return payloads[-1], run.cleaned_up, any("error" in p for p in payloads), "a" in mux.tasks
+
+
+def test_cancel_while_streaming():
+    async def run():
+        return [await _cancel_while_streaming(0.01 + i * 0.003) for i in range(20)]
+
+    for last, cleaned_up, errored, still_listed in asyncio.run(run()):
+        assert last == {"cancelled": True}, last
+        assert cleaned_up
+        assert not errored
+        assert not still_listed
+
+
+def test_finished_task_sends_done():
+    async def run():
+        sent, send = _recorder()
+        mux = TaskMultiplexer(send, max_tasks=8)
+        fake = FakeRun(deltas=5, delay=0)
+        mux.start("a", fake.events)
+        await mux.tasks["a"]
+        return sent, fake.cleaned_up
+
+    sent, cleaned_up = asyncio.run(run())
+    payloads = [payload for _, payload in sent]
+    assert payloads[-1] == {"done": True}
+    assert "".join(p.get("content", "") for p in payloads) == "".join(f"chunk {i} " for i in range(5))
+    assert cleaned_up
+
+
+def test_close_cancels_without_cancelled_event():
+    async def run():
+        sent, send = _recorder()
+        mux = TaskMultiplexer(send, max_tasks=8)
+        runs = [FakeRun(), FakeRun()]
+        mux.start("a", runs[0].events)
+        mux.start("b", runs[1].events)
+        await asyncio.sleep(0.02)
+        await mux.close()
+        return sent, runs, mux.tasks
+
+    sent, runs, tasks = asyncio.run(run())
+    assert all(r.cleaned_up for r in runs)
+    assert not tasks
+    assert not any("cancelled" in p or "error" in p for _, p in sent)
+
+
+def test_refuses_duplicate_and_excess_tasks():
+    async def run():
+        _, send = _recorder()
+        mux = TaskMultiplexer(send, max_tasks=1)
+        errors = [mux.start("a", FakeRun().events), mux.start("a", FakeRun().events), mux.start("b", FakeRun().events)]
+        await mux.close()
+        return errors
+
+    first, duplicate, excess = asyncio.run(run())
+    assert first is None
+    assert duplicate == "Task id already in use"
+    assert excess == "At most 1 concurrent tasks per connection"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"{name}: ok")